@@ -0,0 +1,42 @@
+"""Shared helpers for the benchmark scripts: scratch-schema engine and synthetic seed data."""
+import os
+import sys
+
+from sqlalchemy import URL, create_engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from setup_db import SYNTHETIC_DATA_SQL, load_db_config  # noqa: E402
+
+
+def scratch_engine(schema):
+    """Engine on the configured database whose search_path points at the scratch schema."""
+    os.chdir(ROOT)
+    config = load_db_config()
+    url = URL.create("postgresql+psycopg2", username=config["username"], password=config["password"],
+                     host=config["host"], port=config["port"], database=config["database"])
+    return create_engine(url, connect_args={"options": f"-c search_path={schema},public"})
+
+
+def seed_scratch_schema(engine, schema, migrations, artists, cities, paintings, seed=0.42):
+    """(Re)create the schema, load the setup_db.py synthetic dataset, apply the given migrations and ANALYZE."""
+    print(f"🌱 Seeding {paintings} paintings into schema '{schema}'...")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema};")
+        # The reset section of create_tables.sql must never reach tables outside the scratch schema
+        conn.exec_driver_sql(f"SET LOCAL search_path TO {schema};")
+        with open("create_tables.sql", encoding="utf-8") as f:
+            conn.exec_driver_sql(f.read())
+        conn.exec_driver_sql(f"SET LOCAL search_path TO {schema}, public;")
+        conn.exec_driver_sql(SYNTHETIC_DATA_SQL, {"artists": artists, "cities": cities,
+                                                  "paintings": paintings, "seed": seed})
+        for migration in migrations:
+            with open(migration, encoding="utf-8") as f:
+                conn.exec_driver_sql(f.read())
+        conn.exec_driver_sql("ANALYZE;")
+
+
+def drop_scratch_schema(engine, schema):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
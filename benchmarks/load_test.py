@@ -0,0 +1,404 @@
+"""Load test: concurrent simulated sessions against the app, for deployment sizing.
+
+Drives N simulated users through View Data, Advanced Search and the add forms with
+Streamlit's AppTest. Every session repeats a random action and then pauses for a
+random think time. An action is one of:
+
+- browsing View Data
+- a quick search followed by a style filter in Advanced Search
+- (with --write-ratio) adding an artist, a city or a painting
+
+The sessions are spread over --processes app processes. Each process has its own
+caches, connection pool and change listener, like one `streamlit run` process behind
+a load balancer. AppTest executes one script at a time per process, so the reruns of
+a process's sessions queue behind each other. The measured latency includes that
+wait, as on a server process whose CPU is busy.
+
+Each stage (--sessions 1 5 10 runs three) lasts --duration seconds and reports:
+
+- throughput (page runs per second) and p50/p95/p99 latency, overall and per step
+- pool usage per process: peak checked-out connections, checkout waits and timeouts
+- connections to the database seen by the server (all clients, not only this test)
+- resident memory of every app process
+
+Run it against a database loaded with `python setup_db.py --synthetic`. Rows added
+by the test are named "LoadTest ..." and deleted at the end unless --keep-data is
+given. The sidebar of the app is not rendered by the simulated sessions.
+
+Usage: python benchmarks/load_test.py [--sessions N [N ...]] [--processes N] [--duration S]
+                                      [--think-time S] [--write-ratio R] [--output FILE] [--keep-data]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from common import ROOT
+from setup_db import connect, load_db_config
+
+# Steps slower than this count as failed (AppTest raises on the timeout)
+RUN_TIMEOUT_SECONDS = 60
+# Seconds between samples of connections and memory
+SAMPLE_INTERVAL = 1.0
+
+# Share of read actions; writes take --write-ratio off the top
+READ_ACTIONS = {"view_data": 0.5, "advanced_search": 0.5}
+WRITE_ACTIONS = ["add_artist", "add_city", "add_painting"]
+
+VIEW_TYPES = ["All Paintings", "All Artists", "All Cities", "Paintings by City", "Paintings by Artist",
+              "Paintings by Style"]
+# Typed into the Advanced Search quick search, as in benchmarks/text_search_latency.py
+SEARCH_TERMS = ["go", "gold", "golden har", "misty lady", "catedral", "madona", "verm", "frida kahl"]
+STYLES = ["Renaissance", "Baroque", "Impressionism", "Cubism", "Surrealism", "Contemporary"]
+
+# Prefix of every row the test adds, so they can be deleted afterwards
+TAG = "LoadTest"
+CLEANUP_SQL = f"""
+    DELETE FROM painting WHERE title LIKE '{TAG} %';
+    DELETE FROM artist WHERE first_name = '{TAG}';
+    DELETE FROM city WHERE name LIKE '{TAG} %';
+    CALL refresh_painting_denormalized();
+"""
+
+SERVER_CONNECTIONS_SQL = """
+    SELECT count(*), count(*) FILTER (WHERE state = 'active')
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid();
+"""
+
+# AppTest swaps process-wide Streamlit state for the duration of a run, so runs of one
+# process must not overlap
+RUN_LOCK = threading.Lock()
+
+
+def page_script(page):
+    """Script run by every AppTest: one page of the app (source is copied by AppTest.from_function)."""
+    import streamlit_app
+    getattr(streamlit_app, page)()
+
+
+def resident_memory_mb():
+    """Current resident set size of this process (peak size where /proc is not available)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(samples):
+    """Count, p50/p95/p99 and maximum of a list of latencies in milliseconds."""
+    return {
+        "count": len(samples),
+        "p50_ms": round(statistics.median(samples), 1),
+        "p95_ms": round(percentile(samples, 0.95), 1),
+        "p99_ms": round(percentile(samples, 0.99), 1),
+        "max_ms": round(max(samples), 1),
+    }
+
+
+class SimulatedSession(threading.Thread):
+    """One user: repeats a random action, then thinks, until stopped.
+
+    Keeps one AppTest per page, so widget state carries over between the runs of a page
+    as it does in a browser tab.
+    """
+
+    def __init__(self, number, args, stop, results):
+        super().__init__(name=f"session-{number}", daemon=True)
+        self.number = number
+        self.args = args
+        self.stop_event = stop
+        self.results = results
+        self.random = random.Random(args.seed + number)
+        self.pages = {}
+
+    def page(self, name):
+        if name not in self.pages:
+            from streamlit.testing.v1 import AppTest
+            self.pages[name] = AppTest.from_function(page_script, args=(name,),
+                                                     default_timeout=RUN_TIMEOUT_SECONDS)
+        return self.pages[name]
+
+    def step(self, name, at):
+        """Rerun a page and record the step's latency, or why it failed."""
+        started = time.perf_counter()
+        try:
+            with RUN_LOCK:
+                at.run()
+            if at.exception:
+                error = at.exception[0].message
+            elif at.error:
+                error = at.error[0].value
+            else:
+                error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        self.results.append((name, (time.perf_counter() - started) * 1000, error))
+        return error is None
+
+    def think(self):
+        self.stop_event.wait(self.random.uniform(0.5, 1.5) * self.args.think_time)
+
+    def run(self):
+        # Spread the session starts over the first think time
+        self.stop_event.wait(self.random.uniform(0, self.args.think_time))
+        while not self.stop_event.is_set():
+            if self.random.random() < self.args.write_ratio:
+                action = self.random.choice(WRITE_ACTIONS)
+            else:
+                action = self.random.choices(list(READ_ACTIONS), weights=READ_ACTIONS.values())[0]
+            getattr(self, action)()
+
+    def view_data(self):
+        at = self.page("show_view_data")
+        if not self.step("view_data.open", at):
+            return
+        self.think()
+        at.selectbox[0].select(self.random.choice(VIEW_TYPES))
+        self.step("view_data.view", at)
+        self.think()
+
+    def advanced_search(self):
+        at = self.page("show_advanced_search")
+        if not self.step("search.open", at):
+            return
+        self.think()
+        at.text_input(key="quick_search").input(self.random.choice(SEARCH_TERMS))
+        if not self.step("search.quick", at):
+            return
+        self.think()
+        at.text_input(key="quick_search").input("")
+        # Options are labelled "<style> (<paintings>)"
+        styles = at.multiselect(key="search_styles")
+        if styles.options:
+            styles.select(self.random.choice(styles.options).rsplit(" (", 1)[0])
+        if self.step("search.filter", at):
+            at.multiselect(key="search_styles").set_value([])
+        self.think()
+
+    def add_artist(self):
+        at = self.page("show_add_artist")
+        if not self.step("add_artist.open", at):
+            return
+        self.think()
+        at.text_input[0].input(TAG)
+        at.text_input[1].input(f"Session {self.number}")
+        at.number_input[0].set_value(self.random.randint(1400, 1990))
+        at.button[0].click()
+        self.step("add_artist.submit", at)
+        self.think()
+
+    def add_city(self):
+        at = self.page("show_add_city")
+        if not self.step("add_city.open", at):
+            return
+        self.think()
+        # Not from the seeded generator, so reruns with --keep-data do not repeat zipcodes
+        at.text_input[0].input(f"LT{random.SystemRandom().randrange(10 ** 8):08d}")
+        at.text_input[1].input(f"{TAG} {self.number}")
+        at.button[0].click()
+        self.step("add_city.submit", at)
+        self.think()
+
+    def add_painting(self):
+        at = self.page("show_add_painting")
+        if not self.step("add_painting.open", at):
+            return
+        self.think()
+        at.text_input[0].input(f"{TAG} {self.number}-{self.random.getrandbits(32):08x}")
+        at.selectbox[0].select(self.random.choice(STYLES))
+        at.number_input[0].set_value(self.random.randint(1400, 2020))
+        at.selectbox[1].set_value(self.random.choice(at.selectbox[1].options))
+        at.selectbox[2].set_value(self.random.choice(at.selectbox[2].options))
+        at.button[0].click()
+        self.step("add_painting.submit", at)
+        self.think()
+
+
+def sample_until(stop, sample):
+    """Call sample() every SAMPLE_INTERVAL until stop is set, and once more after; return the samples."""
+    samples = []
+    while not stop.is_set():
+        samples.append(sample())
+        stop.wait(SAMPLE_INTERVAL)
+    samples.append(sample())
+    return samples
+
+
+def run_process(numbers, args):
+    """One app process: run the given sessions for args.duration and return its measurements."""
+    # AppTest and st.secrets look for .streamlit/secrets.toml in the working directory
+    os.chdir(ROOT)
+    from streamlit.testing.v1 import AppTest
+    from db import get_connection, get_db_metrics, pool_status
+
+    # One run first, so the app module is imported and the shared caches are warm
+    AppTest.from_function(page_script, args=("show_view_data",), default_timeout=RUN_TIMEOUT_SECONDS).run()
+    engine = get_connection().engine
+    before = get_db_metrics().snapshot()
+    rss_start = resident_memory_mb()
+
+    stop = threading.Event()
+    results = []
+    sessions = [SimulatedSession(number, args, stop, results) for number in numbers]
+    samples = []
+    sampler = threading.Thread(target=lambda: samples.extend(sample_until(
+        stop, lambda: (pool_status(engine)["checked_out"], resident_memory_mb()))))
+    started = time.perf_counter()
+    sampler.start()
+    for session in sessions:
+        session.start()
+    stop.wait(args.duration)
+    stop.set()
+    for session in sessions:
+        session.join()
+    sampler.join()
+    after = get_db_metrics().snapshot()
+
+    return {
+        "results": results,
+        "seconds": time.perf_counter() - started,
+        "pool_checked_out_peak": max(checked_out for checked_out, _ in samples),
+        "pool_checkouts": after["checkouts"] - before["checkouts"],
+        "pool_checkout_wait_max_ms": round(after["checkout_wait_max_ms"], 1),
+        "pool_checkout_timeouts": after["checkout_timeouts"] - before["checkout_timeouts"],
+        "rss_start_mb": round(rss_start, 1),
+        "rss_peak_mb": round(max(rss for _, rss in samples), 1),
+        "rss_end_mb": round(resident_memory_mb(), 1),
+    }
+
+
+def run_stage(sessions, args, monitor):
+    """Run one stage with the given number of sessions, in fresh app processes, and summarize it."""
+    processes = min(args.processes, sessions)
+
+    def server_connections():
+        with monitor.cursor() as cur:
+            cur.execute(SERVER_CONNECTIONS_SQL)
+            return cur.fetchone()
+
+    stop = threading.Event()
+    server_samples = []
+    sampler = threading.Thread(target=lambda: server_samples.extend(sample_until(stop, server_connections)))
+    sampler.start()
+    try:
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            workers = list(pool.map(run_process, [range(sessions)[p::processes] for p in range(processes)],
+                                    [args] * processes))
+    finally:
+        stop.set()
+        sampler.join()
+
+    results = [result for worker in workers for result in worker["results"]]
+    seconds = max(worker["seconds"] for worker in workers)
+    latencies = [ms for _, ms, error in results if error is None]
+    per_step = {}
+    failures = {}
+    for name, ms, error in results:
+        if error is None:
+            per_step.setdefault(name, []).append(ms)
+        else:
+            failures[f"{name}: {error}"] = failures.get(f"{name}: {error}", 0) + 1
+    return {
+        "sessions": sessions,
+        "processes": processes,
+        "seconds": round(seconds, 1),
+        "steps": len(results),
+        "failed_steps": sum(failures.values()),
+        "failures": failures,
+        "throughput_per_sec": round(len(latencies) / seconds, 2),
+        "latency": latency_summary(latencies) if latencies else None,
+        "per_step": {name: latency_summary(values) for name, values in sorted(per_step.items())},
+        "connections": {
+            "server_connections_peak": max(total for total, _ in server_samples),
+            "server_active_peak": max(active for _, active in server_samples),
+            "per_process": [{key: worker[key] for key in ("pool_checked_out_peak", "pool_checkouts",
+                                                          "pool_checkout_wait_max_ms", "pool_checkout_timeouts")}
+                            for worker in workers],
+        },
+        "memory": [{key: worker[key] for key in ("rss_start_mb", "rss_peak_mb", "rss_end_mb")}
+                   for worker in workers],
+    }
+
+
+def print_stage(stage):
+    latency = stage["latency"] or {"p50_ms": 0, "p95_ms": 0, "p99_ms": 0}
+    connections = stage["connections"]
+    print(f"   {stage['sessions']:4} sessions   {stage['throughput_per_sec']:7.2f} runs/s   "
+          f"p50 {latency['p50_ms']:8.1f} ms   p95 {latency['p95_ms']:8.1f} ms   p99 {latency['p99_ms']:8.1f} ms   "
+          f"failed {stage['failed_steps']:4}")
+    print(f"        server peak {connections['server_connections_peak']} connections "
+          f"({connections['server_active_peak']} active)")
+    for number, (pool, memory) in enumerate(zip(connections["per_process"], stage["memory"]), start=1):
+        print(f"        process {number}: pool peak {pool['pool_checked_out_peak']} checked out, "
+              f"wait max {pool['pool_checkout_wait_max_ms']} ms, {pool['pool_checkout_timeouts']} timeouts · "
+              f"RSS {memory['rss_start_mb']} → {memory['rss_peak_mb']} MB")
+    for name, summary in stage["per_step"].items():
+        print(f"        {name:24} {summary['count']:6} runs   p50 {summary['p50_ms']:8.1f} ms   "
+              f"p95 {summary['p95_ms']:8.1f} ms")
+    for failure, count in stage["failures"].items():
+        print(f"        ❌ {count} × {failure[:160]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20],
+                        help="concurrent sessions of each stage")
+    parser.add_argument("--processes", type=int, default=1, help="app processes the sessions are spread over")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds per stage")
+    parser.add_argument("--think-time", type=float, default=2.0, help="mean seconds between steps of a session")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="share of actions that add a row")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="load_test.json", help="JSON results file")
+    parser.add_argument("--keep-data", action="store_true", help="keep the rows added by the test")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    monitor = connect(load_db_config())
+    monitor.autocommit = True
+
+    stages = []
+    try:
+        for sessions in args.sessions:
+            print(f"\n👥 {sessions} sessions in {min(args.processes, sessions)} processes "
+                  f"for {args.duration:.0f}s...")
+            stages.append(run_stage(sessions, args, monitor))
+            print_stage(stages[-1])
+    finally:
+        if not args.keep_data:
+            with monitor.cursor() as cur:
+                cur.execute(CLEANUP_SQL)
+            print(f"\n🧹 Removed the rows added by the test")
+        monitor.close()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": {"processes": args.processes, "duration": args.duration, "think_time": args.think_time,
+                     "write_ratio": args.write_ratio, "seed": args.seed},
+        "environment": {"python": platform.python_version(), "cpus": os.cpu_count()},
+        "stages": stages,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✨ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
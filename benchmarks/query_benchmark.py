@@ -0,0 +1,189 @@
+"""Latency benchmark of every query the app issues, with JSON output for regression tracking.
+
+Seeds the setup_db.py synthetic dataset (sizes configurable) into a scratch schema
+with all migrations applied, then times the dropdown lookups, all six View Data
+views, the Statistics and Analytics pages, representative Advanced Search filter combinations
+(result and facet queries) and the quick search. Parameters are picked from the data: the busiest
+and a median artist/city, so both skewed and typical cases are measured.
+
+Each case reports rows, p50/p95/p99 latency and rows/sec (at p50). Results are
+printed and written as JSON to --output. Use --keep and --reuse to benchmark the
+same dataset repeatedly without seeding it again.
+
+Usage: python benchmarks/query_benchmark.py [--artists N] [--cities N] [--paintings N]
+                                            [--runs N] [--output FILE] [--keep] [--reuse]
+"""
+import argparse
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from common import drop_scratch_schema, scratch_engine, seed_scratch_schema
+import queries  # noqa: E402 (on sys.path via common)
+from search import build_facet_query, build_search_query, build_text_search_query
+from setup_db import MIGRATIONS
+
+SCHEMA = "query_bench"
+PAGE_SIZE = 25
+# First page of Advanced Search results, as shown by the app
+SEARCH_RESULTS_PAGE_SIZE = 500
+
+# Entity whose painting count is the maximum / median of all counts
+BUSIEST_AND_MEDIAN_SQL = """
+    WITH counts AS ({counts}), ranked AS (
+        SELECT *, row_number() OVER (ORDER BY paintings DESC, key) AS position, count(*) OVER () AS total
+        FROM counts
+    )
+    SELECT key FROM ranked WHERE position IN (1, (total + 1) / 2) ORDER BY position;
+"""
+ARTIST_COUNTS = "SELECT artist_id AS key, count(*) AS paintings FROM painted GROUP BY artist_id"
+CITY_COUNTS = """SELECT (city_country_iso, city_zipcode)::text AS key, count(*) AS paintings
+                 FROM visitable GROUP BY city_country_iso, city_zipcode"""
+
+
+def pick_parameters(conn):
+    """Busiest and median artist and city, the most common style and its country."""
+    artists = [row.key for row in conn.execute(text(BUSIEST_AND_MEDIAN_SQL.format(counts=ARTIST_COUNTS)))]
+    cities = []
+    for row in conn.execute(text(BUSIEST_AND_MEDIAN_SQL.format(counts=CITY_COUNTS))):
+        iso, zipcode = row.key.strip("()").split(",")
+        cities.append((iso, zipcode))
+    style = conn.execute(text(queries.LOOKUP_QUERIES["styles"])).scalar()
+    return {"artists": artists, "cities": cities, "style": style, "country": cities[0][0]}
+
+
+def page_params(after_key):
+    """PAINTINGS_PAGE parameters for the page after the given view key."""
+    after_serial, after_artist, after_iso, after_zip = after_key
+    return {"after_serial": after_serial, "after_artist": after_artist,
+            "after_iso": after_iso, "after_zip": after_zip, "limit": PAGE_SIZE + 1}
+
+
+def build_cases(p, paintings):
+    """(name, query, params) for every benchmarked query."""
+    busiest_artist, median_artist = p["artists"]
+    busiest_city, median_city = p["cities"]
+
+    cases = [(f"lookup.{entity}", query, {}) for entity, query in queries.LOOKUP_QUERIES.items()]
+    cases += [
+        ("view.all_paintings.count", queries.PAINTINGS_COUNT, {}),
+        ("view.all_paintings.first_page", queries.PAINTINGS_PAGE,
+         page_params(queries.PAINTINGS_FIRST_KEY)),
+        ("view.all_paintings.middle_page", queries.PAINTINGS_PAGE,
+         page_params((paintings // 2, 0, "", ""))),
+        ("view.all_artists", queries.ALL_ARTISTS, {}),
+        ("view.all_cities", queries.ALL_CITIES, {}),
+        ("view.by_city.busiest", queries.PAINTINGS_BY_CITY,
+         {"country_iso": busiest_city[0], "zipcode": busiest_city[1]}),
+        ("view.by_city.median", queries.PAINTINGS_BY_CITY,
+         {"country_iso": median_city[0], "zipcode": median_city[1]}),
+        ("view.by_artist.busiest", queries.PAINTINGS_BY_ARTIST, {"artist_id": busiest_artist}),
+        ("view.by_artist.median", queries.PAINTINGS_BY_ARTIST, {"artist_id": median_artist}),
+        ("view.by_style", queries.PAINTINGS_BY_STYLE, {"style": p["style"]}),
+        ("statistics.totals", queries.STATISTICS_TOTALS, {}),
+        ("statistics.per_style", queries.PAINTINGS_PER_STYLE, {}),
+        ("statistics.per_decade", queries.PAINTINGS_PER_DECADE, {}),
+        ("statistics.per_country", queries.PAINTINGS_PER_COUNTRY, {}),
+        ("statistics.top_artists", queries.TOP_ARTISTS, {"limit": 10}),
+        ("statistics.top_cities", queries.TOP_CITIES, {"limit": 10}),
+        ("analytics.country_decades", queries.COUNTRY_DECADES, {"limit": 10}),
+        ("analytics.city_decades", queries.CITY_DECADES, {"limit": 10}),
+        ("analytics.style_decades", queries.STYLE_DECADES, {}),
+        ("analytics.artist_decades", queries.ARTIST_DECADES, {}),
+    ]
+
+    filter_combinations = {
+        "none": {},
+        "style": {"styles": [p["style"]]},
+        "country": {"country_isos": [p["country"]]},
+        "country+style": {"country_isos": [p["country"]], "styles": [p["style"]]},
+        "city": {"city_keys": [busiest_city]},
+        "artist": {"artist_ids": [median_artist]},
+        "artist+style": {"artist_ids": [median_artist], "styles": [p["style"]]},
+        "busiest_artist+country": {"artist_ids": [busiest_artist], "country_isos": [p["country"]]},
+    }
+    for name, filters in filter_combinations.items():
+        cases.append((f"search.facets.{name}", *build_facet_query(**filters)))
+        cases.append((f"search.results.{name}", *build_search_query(**filters, limit=SEARCH_RESULTS_PAGE_SIZE)))
+
+    for term in ["golden har", "madona", "vermeer"]:
+        cases.append((f"quick_search.{term.replace(' ', '_')}", *build_text_search_query(term, PAGE_SIZE + 1)))
+    return cases
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_case(conn, query, params, runs):
+    """Run one query (plus a warm-up) and summarize its latency distribution."""
+    statement = text(query)
+    rows = len(conn.execute(statement, params).fetchall())
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        conn.execute(statement, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p50 = statistics.median(timings)
+    return {
+        "rows": rows,
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "rows_per_sec": round(rows / (p50 / 1000)) if p50 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--artists", type=int, default=10000)
+    parser.add_argument("--cities", type=int, default=50000)
+    parser.add_argument("--paintings", type=int, default=1000000)
+    parser.add_argument("--seed", type=float, default=0.42, help="random seed in [-1, 1]")
+    parser.add_argument("--runs", type=int, default=10, help="timed runs per query")
+    parser.add_argument("--output", default="query_benchmark.json", help="JSON results file")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    parser.add_argument("--reuse", action="store_true", help="reuse a kept scratch schema instead of seeding")
+    args = parser.parse_args()
+
+    engine = scratch_engine(SCHEMA)
+    results = {}
+    try:
+        if not args.reuse:
+            seed_scratch_schema(engine, SCHEMA, MIGRATIONS, args.artists, args.cities, args.paintings, args.seed)
+
+        with engine.connect() as conn:
+            server_version = conn.execute(text("SHOW server_version")).scalar()
+            paintings = int(conn.execute(text("SELECT count(*) FROM painting")).scalar())
+            cases = build_cases(pick_parameters(conn), paintings)
+            print(f"⏱️  {len(cases)} queries, {args.runs} runs each\n")
+            for name, query, params in cases:
+                results[name] = run_case(conn, query, params, args.runs)
+                r = results[name]
+                print(f"   {name:36} {r['rows']:8} rows   p50 {r['p50_ms']:9.1f} ms   "
+                      f"p95 {r['p95_ms']:9.1f} ms   p99 {r['p99_ms']:9.1f} ms")
+    finally:
+        if not args.keep:
+            drop_scratch_schema(engine, SCHEMA)
+        engine.dispose()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "dataset": {"artists": args.artists, "cities": args.cities, "paintings": paintings,
+                    "seed": args.seed, "reused": args.reuse},
+        "runs": args.runs,
+        "environment": {"postgres": server_version, "python": platform.python_version()},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✨ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Latency benchmark for the quick (full-text + fuzzy) title/artist search.
+
+Seeds a large synthetic catalog (one million paintings by default) into a scratch
+schema with the text search migration applied, then runs typeahead-style terms
+(prefixes, multi-word prefixes, typos, artist names) through the exact query the
+Advanced Search page issues. Exits with status 1 if any term's p95 latency exceeds
+the target. The scratch schema is dropped afterwards unless --keep is given.
+
+Usage: python benchmarks/text_search_latency.py [--paintings N] [--runs N] [--target-ms MS]
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+from common import drop_scratch_schema, scratch_engine, seed_scratch_schema
+from search import build_text_search_query
+
+SCHEMA = "text_search_bench"
+MIGRATIONS = ["migrations/001_indexes_and_reporting_view.sql", "migrations/002_text_search.sql"]
+
+# Typeahead as a user types: partial words, completed words, typos and artist names
+TERMS = ["go", "gold", "golden har", "misty lady", "catedral", "madona", "verm", "frida kahl",
+         "Still Life No. 4"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--artists", type=int, default=10000)
+    parser.add_argument("--cities", type=int, default=5000)
+    parser.add_argument("--paintings", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per term")
+    parser.add_argument("--target-ms", type=float, default=50.0, help="p95 latency target")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = parser.parse_args()
+
+    engine = scratch_engine(SCHEMA)
+    failures = []
+    try:
+        seed_scratch_schema(engine, SCHEMA, MIGRATIONS, args.artists, args.cities, args.paintings)
+
+        print(f"⏱️  {args.runs} runs per term, first page of 25 results\n")
+        with engine.connect() as conn:
+            for term in TERMS:
+                query, params = build_text_search_query(term)
+                rows = len(conn.execute(text(query), params).fetchall())  # warm-up
+                timings = []
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    conn.execute(text(query), params).fetchall()
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                p50 = statistics.median(timings)
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                status = "✅" if p95 <= args.target_ms else "❌"
+                print(f"   {status} {term!r:22} {rows:3} rows   p50 {p50:7.1f} ms   p95 {p95:7.1f} ms")
+                if p95 > args.target_ms:
+                    failures.append(term)
+    finally:
+        if not args.keep:
+            drop_scratch_schema(engine, SCHEMA)
+        engine.dispose()
+
+    if failures:
+        print(f"\n❌ {len(failures)} term(s) above the {args.target_ms:.0f} ms p95 target.")
+        sys.exit(1)
+    print(f"\n✨ All terms within the {args.target_ms:.0f} ms p95 target.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Bulk importer for artists, cities and paintings from CSV or Parquet files.
+
+Files are streamed in batches. Each batch is loaded with COPY into a temporary
+staging table, validated and resolved set-wise (artist and city foreign keys), and
+inserted into the target tables in one transaction. Rejected rows are reported with
+their row number and reason instead of aborting the import.
+
+Usage: python bulk_import.py {artists,cities,paintings} FILE [--batch-size N]
+
+Expected columns:
+    artists:   first_name, last_name, birth_year, death_year
+    cities:    country_iso, zipcode, name
+    paintings: title, style_type, year_created, wikipedia_url,
+               artist_first_name, artist_last_name, city_country_iso, city_zipcode
+"""
+import argparse
+import io
+import sys
+import time
+
+import pandas as pd
+
+DEFAULT_BATCH_SIZE = 50000
+# Rejected rows kept with full details; further rejects are only counted
+MAX_REJECT_DETAILS = 1000
+
+ENTITY_COLUMNS = {
+    "artists": ["first_name", "last_name", "birth_year", "death_year"],
+    "cities": ["country_iso", "zipcode", "name"],
+    "paintings": ["title", "style_type", "year_created", "wikipedia_url",
+                  "artist_first_name", "artist_last_name", "city_country_iso", "city_zipcode"],
+}
+OPTIONAL_COLUMNS = {"birth_year", "death_year", "year_created", "wikipedia_url"}
+
+# Extra (resolved) columns of the staging tables besides the raw text columns
+STAGING_EXTRA_COLUMNS = {
+    "artists": "",
+    "cities": "",
+    "paintings": ", artist_id INTEGER, artist_matches INTEGER NOT NULL DEFAULT 0,"
+                 " city_found BOOLEAN NOT NULL DEFAULT FALSE, serial_number INTEGER",
+}
+
+# Statements run per batch, in order, after the batch has been copied into staging.
+# Each list starts by indexing and analyzing the staging table, so that the planner
+# knows its size; the checks against the file itself and the target tables are then
+# window functions and joins over the whole batch instead of a subquery per row.
+BATCH_STATEMENTS = {
+    "artists": [
+        "CREATE INDEX ON staging_artists (last_name, first_name, birth_year, row_number);",
+        "ANALYZE staging_artists;",
+        """
+        UPDATE staging_artists s SET reject_reason = CASE
+            WHEN s.first_name IS NULL OR s.last_name IS NULL THEN 'missing first_name or last_name'
+            WHEN length(s.first_name) > 100 OR length(s.last_name) > 100 THEN 'name longer than 100 characters'
+            WHEN s.birth_year IS NOT NULL AND s.birth_year !~ '^\\d{1,4}$' THEN 'invalid birth_year'
+            WHEN s.death_year IS NOT NULL AND s.death_year !~ '^\\d{1,4}$' THEN 'invalid death_year'
+            WHEN s.death_year::int < s.birth_year::int THEN 'death_year before birth_year'
+            WHEN v.existing THEN 'artist already exists'
+            WHEN v.occurrence > 1 THEN 'duplicate row in file'
+        END
+        FROM (
+            SELECT
+                d.row_number,
+                a.last_name IS NOT NULL AS existing,
+                row_number() OVER (PARTITION BY d.last_name, d.first_name, d.birth_year
+                                   ORDER BY d.row_number) AS occurrence
+            FROM staging_artists d
+            LEFT JOIN (
+                SELECT DISTINCT first_name, last_name, birth_year
+                FROM artist
+                WHERE (last_name, first_name) IN (SELECT last_name, first_name FROM staging_artists)
+            ) a ON a.first_name = d.first_name AND a.last_name = d.last_name
+               AND a.birth_year IS NOT DISTINCT FROM
+                   CASE WHEN d.birth_year ~ '^\\d{1,4}$' THEN d.birth_year::int END
+        ) v
+        WHERE v.row_number = s.row_number;
+        """,
+        """
+        INSERT INTO artist (first_name, last_name, birth_year, death_year)
+        SELECT first_name, last_name, birth_year::int, death_year::int
+        FROM staging_artists
+        WHERE reject_reason IS NULL
+        ORDER BY row_number;
+        """,
+    ],
+    "cities": [
+        "CREATE INDEX ON staging_cities ((upper(country_iso)), zipcode, row_number);",
+        "ANALYZE staging_cities;",
+        """
+        UPDATE staging_cities s SET reject_reason = CASE
+            WHEN s.country_iso IS NULL OR s.zipcode IS NULL OR s.name IS NULL THEN 'missing country_iso, zipcode or name'
+            WHEN length(s.zipcode) > 10 THEN 'zipcode longer than 10 characters'
+            WHEN length(s.name) > 100 THEN 'name longer than 100 characters'
+            WHEN NOT v.country_found THEN 'unknown country'
+            WHEN v.existing THEN 'city already exists'
+            WHEN v.occurrence > 1 THEN 'duplicate row in file'
+        END
+        FROM (
+            SELECT
+                d.row_number,
+                co.iso IS NOT NULL AS country_found,
+                c.zipcode IS NOT NULL AS existing,
+                row_number() OVER (PARTITION BY upper(d.country_iso), d.zipcode ORDER BY d.row_number) AS occurrence
+            FROM staging_cities d
+            LEFT JOIN country co ON co.iso = upper(d.country_iso)
+            LEFT JOIN city c ON c.country_iso = upper(d.country_iso) AND c.zipcode = d.zipcode
+        ) v
+        WHERE v.row_number = s.row_number;
+        """,
+        """
+        INSERT INTO city (country_iso, zipcode, name)
+        SELECT upper(country_iso), zipcode, name
+        FROM staging_cities
+        WHERE reject_reason IS NULL;
+        """,
+    ],
+    "paintings": [
+        "ANALYZE staging_paintings;",
+        # Resolve artist and city foreign keys set-wise; a name shared by several
+        # artists is rejected below rather than linked to one of them
+        """
+        UPDATE staging_paintings s SET artist_id = a.id, artist_matches = a.matches
+        FROM (
+            SELECT first_name, last_name, MIN(id) AS id, count(*) AS matches
+            FROM artist
+            WHERE (first_name, last_name) IN (SELECT artist_first_name, artist_last_name FROM staging_paintings)
+            GROUP BY first_name, last_name
+        ) a
+        WHERE a.first_name = s.artist_first_name AND a.last_name = s.artist_last_name;
+        """,
+        """
+        UPDATE staging_paintings s SET city_found = TRUE
+        FROM city c
+        WHERE c.country_iso = upper(s.city_country_iso) AND c.zipcode = s.city_zipcode;
+        """,
+        """
+        UPDATE staging_paintings s SET reject_reason = CASE
+            WHEN s.title IS NULL THEN 'missing title'
+            WHEN length(s.title) > 200 THEN 'title longer than 200 characters'
+            WHEN s.style_type IS NULL THEN 'missing style_type'
+            WHEN length(s.style_type) > 50 THEN 'style_type longer than 50 characters'
+            WHEN s.year_created IS NOT NULL AND CASE WHEN s.year_created ~ '^\\d{1,4}$'
+                     THEN s.year_created::int NOT BETWEEN 1001 AND EXTRACT(YEAR FROM CURRENT_DATE)
+                     ELSE TRUE END THEN 'invalid year_created'
+            WHEN length(s.wikipedia_url) > 500 THEN 'wikipedia_url longer than 500 characters'
+            WHEN s.artist_id IS NULL THEN 'unknown artist'
+            WHEN s.artist_matches > 1 THEN 'ambiguous artist'
+            WHEN NOT s.city_found THEN 'unknown city'
+        END;
+        """,
+        # Pre-allocate serial numbers so the relationship rows can be inserted set-wise
+        """
+        UPDATE staging_paintings
+        SET serial_number = nextval(pg_get_serial_sequence('painting', 'serial_number'))
+        WHERE reject_reason IS NULL;
+        """,
+        """
+        INSERT INTO painting (serial_number, title, style_type, year_created, wikipedia_url)
+        SELECT serial_number, title, style_type, year_created::int, wikipedia_url
+        FROM staging_paintings
+        WHERE reject_reason IS NULL
+        ORDER BY serial_number;
+        """,
+        """
+        INSERT INTO painted (artist_id, painting_serial_number)
+        SELECT artist_id, serial_number
+        FROM staging_paintings
+        WHERE reject_reason IS NULL;
+        """,
+        """
+        INSERT INTO visitable (city_country_iso, city_zipcode, painting_serial_number)
+        SELECT upper(city_country_iso), city_zipcode, serial_number
+        FROM staging_paintings
+        WHERE reject_reason IS NULL;
+        """,
+    ],
+}
+
+
+def read_batches(source, file_format, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield DataFrames of at most batch_size rows from a CSV or Parquet file (path or file object)."""
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=batch_size):
+            yield batch.to_pandas(types_mapper=pd.ArrowDtype)
+    else:
+        # Keep everything as text; validation and casting happen in the database
+        yield from pd.read_csv(source, chunksize=batch_size, dtype=str, keep_default_na=False)
+
+
+def _copy_batch(cursor, entity, df, first_row_number):
+    """COPY one batch into a fresh temporary staging table."""
+    columns = ENTITY_COLUMNS[entity]
+    missing = [c for c in columns if c not in df.columns and c not in OPTIONAL_COLUMNS]
+    if missing:
+        raise ValueError(f"Missing required column(s) for {entity}: {', '.join(missing)}")
+
+    staging = df.reindex(columns=columns)
+    staging.insert(0, "row_number", range(first_row_number, first_row_number + len(df)))
+
+    cursor.execute(f"""
+        CREATE TEMP TABLE staging_{entity} (
+            row_number BIGINT PRIMARY KEY,
+            {", ".join(f"{c} TEXT" for c in columns)},
+            reject_reason TEXT
+            {STAGING_EXTRA_COLUMNS[entity]}
+        ) ON COMMIT DROP;
+    """)
+    buffer = io.StringIO()
+    staging.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY staging_{entity} (row_number, {', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')",
+        buffer,
+    )
+
+
+def import_file(dbapi_conn, entity, source, file_format="csv", batch_size=DEFAULT_BATCH_SIZE, on_batch=None,
+                refresh_view=None):
+    """Import a CSV/Parquet file into the given entity, committing once per batch.
+
+    dbapi_conn is a psycopg2 connection. on_batch, if given, is called after every
+    committed batch with the running summary. Once paintings were inserted, the
+    reporting view is refreshed at the end, also when a later batch failed:
+    by refresh_view() if given, else on dbapi_conn. Returns a summary dict with row
+    counts, throughput and the rejected rows (row number, reason and raw values).
+    """
+    if entity not in ENTITY_COLUMNS:
+        raise ValueError(f"Unknown entity '{entity}', expected one of {', '.join(ENTITY_COLUMNS)}")
+
+    summary = {"rows": 0, "inserted": 0, "rejected": 0, "rejects": [], "seconds": 0.0, "rows_per_sec": 0.0}
+    started = time.perf_counter()
+
+    try:
+        _import_batches(dbapi_conn, entity, source, file_format, batch_size, on_batch, summary, started)
+    finally:
+        # Keep the reporting view in sync with the paintings committed so far
+        if entity == "paintings" and summary["inserted"]:
+            if refresh_view is not None:
+                refresh_view()
+            else:
+                with dbapi_conn.cursor() as cur:
+                    cur.execute("CALL refresh_painting_denormalized();")
+                dbapi_conn.commit()
+
+    return summary
+
+
+def _import_batches(dbapi_conn, entity, source, file_format, batch_size, on_batch, summary, started):
+    """Import and commit the batches of source, updating summary after each one."""
+    for df in read_batches(source, file_format, batch_size):
+        try:
+            with dbapi_conn.cursor() as cur:
+                _copy_batch(cur, entity, df, summary["rows"] + 1)
+                for statement in BATCH_STATEMENTS[entity]:
+                    cur.execute(statement)
+                cur.execute(f"""
+                    SELECT row_number, reject_reason, {", ".join(ENTITY_COLUMNS[entity])}
+                    FROM staging_{entity}
+                    WHERE reject_reason IS NOT NULL
+                    ORDER BY row_number;
+                """)
+                columns = [d[0] for d in cur.description]
+                rejects = [dict(zip(columns, row)) for row in cur.fetchall()]
+            dbapi_conn.commit()
+        except Exception:
+            dbapi_conn.rollback()
+            raise
+
+        summary["rows"] += len(df)
+        summary["inserted"] += len(df) - len(rejects)
+        summary["rejected"] += len(rejects)
+        summary["rejects"].extend(rejects[:MAX_REJECT_DETAILS - len(summary["rejects"])])
+        summary["seconds"] = time.perf_counter() - started
+        summary["rows_per_sec"] = summary["rows"] / summary["seconds"] if summary["seconds"] else 0.0
+        if on_batch:
+            on_batch(summary)
+
+
+def main():
+    from setup_db import connect, load_db_config
+
+    parser = argparse.ArgumentParser(description="Bulk import artists, cities or paintings.")
+    parser.add_argument("entity", choices=list(ENTITY_COLUMNS))
+    parser.add_argument("file", help="CSV or Parquet file (format taken from the extension)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    file_format = "parquet" if args.file.lower().endswith((".parquet", ".pq")) else "csv"
+    conn = connect(load_db_config())
+
+    def report(summary):
+        print(f"   📦 {summary['rows']} rows processed, {summary['inserted']} inserted, "
+              f"{summary['rejected']} rejected ({summary['rows_per_sec']:.0f} rows/sec)")
+
+    print(f"🚀 Importing {args.entity} from {args.file}...")
+    try:
+        summary = import_file(conn, args.entity, args.file, file_format, args.batch_size, on_batch=report)
+    except Exception as e:
+        print(f"❌ Import failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    for reject in summary["rejects"]:
+        print(f"   ⚠️  Row {reject['row_number']}: {reject['reject_reason']}")
+    if summary["rejected"] > len(summary["rejects"]):
+        print(f"   ... and {summary['rejected'] - len(summary['rejects'])} more rejected rows")
+    print(f"\n✨ Imported {summary['inserted']} of {summary['rows']} rows in {summary['seconds']:.1f}s "
+          f"({summary['rows_per_sec']:.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
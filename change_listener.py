@@ -0,0 +1,100 @@
+import select
+import threading
+import time
+
+# NOTIFY channel of migrations/004_change_notifications.sql; payloads are table names
+CHANNEL = "catalog_changes"
+# Seconds between checks of the stop flag while no notification arrives
+POLL_INTERVAL = 5.0
+# Seconds to wait before reconnecting after the listening connection failed
+RECONNECT_DELAY = 5.0
+
+
+class ChangeListener(threading.Thread):
+    """Background thread that LISTENs for catalog changes and keeps a version per table.
+
+    connect() must return a new psycopg2 connection; the listener keeps it for itself,
+    outside the connection pool. Every notification increments the version of its table
+    and is passed to the subscribed callbacks as a set of table names. After a
+    (re)connect every table counts as changed, since notifications may have been missed.
+    """
+
+    def __init__(self, connect, channel=CHANNEL):
+        super().__init__(name="change-listener", daemon=True)
+        self._connect = connect
+        self._channel = channel
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._callbacks = []
+        self._versions = {}
+        self._changed_at = {}
+        self._epoch = 0
+        self._reconnected_at = 0.0
+        self.connected = False
+        self.notifications = 0
+        self.errors = 0
+        self.last_error = None
+
+    def subscribe(self, callback):
+        """Call callback(tables) on every change; tables is None after a reconnect."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def version(self, tables):
+        """A value that changes whenever one of the tables changes (or the listener reconnects)."""
+        with self._lock:
+            return (self._epoch,) + tuple(self._versions.get(table, 0) for table in tables)
+
+    def seconds_since_change(self, tables):
+        """Seconds since the last change to any of the tables (or since the last reconnect)."""
+        with self._lock:
+            last = max([self._reconnected_at] + [self._changed_at.get(table, 0.0) for table in tables])
+        return time.monotonic() - last
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _changed(self, tables):
+        with self._lock:
+            now = time.monotonic()
+            if tables is None:
+                self._epoch += 1
+                self._reconnected_at = now
+            else:
+                for table in tables:
+                    self._versions[table] = self._versions.get(table, 0) + 1
+                    self._changed_at[table] = now
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(tables)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self._channel};")
+                self.connected = True
+                self._changed(None)
+                self._listen(conn)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                self._stop_event.wait(RECONNECT_DELAY)
+            finally:
+                self.connected = False
+                if conn is not None:
+                    conn.close()
+
+    def _listen(self, conn):
+        while not self._stop_event.is_set():
+            if select.select([conn], [], [], POLL_INTERVAL) == ([], [], []):
+                continue
+            conn.poll()
+            tables = {notify.payload for notify in conn.notifies}
+            conn.notifies.clear()
+            if tables:
+                self.notifications += len(tables)
+                self._changed(tables)
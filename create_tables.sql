@@ -6,8 +6,20 @@
 -- ==========================================
 -- RESET (Drop tables in reverse order of dependency)
 -- ==========================================
+DROP MATERIALIZED VIEW IF EXISTS painting_denormalized;
+DROP TABLE IF EXISTS search_word;
+DROP TABLE IF EXISTS artist_decade_stat;
+DROP TABLE IF EXISTS style_decade_stat;
+DROP TABLE IF EXISTS country_decade_stat;
+DROP TABLE IF EXISTS city_decade_stat;
+DROP TABLE IF EXISTS artist_stat;
+DROP TABLE IF EXISTS city_stat;
+DROP TABLE IF EXISTS country_stat;
+DROP TABLE IF EXISTS style_stat;
+DROP TABLE IF EXISTS decade_stat;
 DROP TABLE IF EXISTS visitable;
 DROP TABLE IF EXISTS painted;
+DROP TABLE IF EXISTS painting_serial;
 DROP TABLE IF EXISTS painting;
 DROP TABLE IF EXISTS artist;
 DROP TABLE IF EXISTS city;
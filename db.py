@@ -0,0 +1,595 @@
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import QueuePool
+
+import queries
+from change_listener import ChangeListener
+from lookup_cache import LookupCache
+from profiling import DEFAULT_EXPLAIN_RATE, DEFAULT_LOG_PATH, DEFAULT_SLOW_MS, ProfiledConnection, QueryProfiler
+
+# Pool defaults, overridable in .streamlit/secrets.toml under [connections.postgresql.pool]
+POOL_DEFAULTS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+    "pool_pre_ping": True,
+    "statement_timeout_ms": 30000,
+    "connect_timeout": 5,
+}
+
+# Query profiling defaults, overridable in .streamlit/secrets.toml under [profiling]
+PROFILING_DEFAULTS = {
+    "log_path": DEFAULT_LOG_PATH,
+    "slow_query_ms": DEFAULT_SLOW_MS,
+    "explain_sample_rate": DEFAULT_EXPLAIN_RATE,
+}
+
+# :name placeholders of the SQL in queries.py (but not :: casts)
+PLACEHOLDER = re.compile(r"(?<!:):(\w+)")
+# Errors after which a prepared statement is re-prepared: it no longer exists (e.g. after
+# DEALLOCATE) or its result columns changed under it (e.g. after a migration)
+REPREPARE_ERRORS = {"26000", "0A000"}
+
+# Read/write splitting, overridable in .streamlit/secrets.toml under [routing]
+ROUTING_DEFAULTS = {
+    "replicas": [],                  # names of the [connections.<name>] sections of read replicas
+    "max_lag_seconds": 10,           # replicas further behind the primary are not used
+    "health_check_seconds": 15,      # how long a replica's health check is trusted
+    "read_your_writes_seconds": 10,  # a session reads from the primary this long after its own writes
+}
+
+# Replay lag of a standby in seconds; 0 when it has replayed everything it received
+# (an idle primary sends nothing, which must not count as lag) or is not a standby at all.
+# NULL when its WAL receiver is not streaming: it then receives nothing and cannot tell
+# how far behind it is. Without pg_read_all_stats the status column reads as NULL, and
+# only a running receiver process is required.
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver
+                         WHERE pid IS NOT NULL AND COALESCE(status, 'streaming') = 'streaming') THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END;
+"""
+
+# Refresh of the reporting view after writes; not bound by the pool's statement timeout,
+# since it runs in the background and its duration grows with the catalog
+REFRESH_VIEW_SQL = "SET LOCAL statement_timeout = 0; CALL refresh_painting_denormalized();"
+
+# Seconds a cached query result may be served; change notifications usually drop it much earlier
+RESULT_CACHE_TTL = 3600
+# Cached query results kept per process; the least recently used ones are dropped first
+RESULT_CACHE_MAX_ENTRIES = 500
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class DatabaseMetrics:
+    """Process-wide pool and query latency metrics, shared by all sessions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait_total_ms = 0.0
+        self.checkout_wait_max_ms = 0.0
+        self.checkout_timeouts = 0
+        self.query_histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.queries = {}
+
+    def record_checkout(self, wait_ms, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+                return
+            self.checkouts += 1
+            self.checkout_wait_total_ms += wait_ms
+            self.checkout_wait_max_ms = max(self.checkout_wait_max_ms, wait_ms)
+
+    def record_query(self, statement, elapsed_ms):
+        # Group statements by their leading text so the same query with other parameters adds up
+        key = " ".join(statement.split())[:80]
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound),
+                      len(LATENCY_BUCKETS_MS))
+        with self._lock:
+            self.query_histogram[bucket] += 1
+            stats = self.queries.setdefault(key, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def snapshot(self):
+        """Return a consistent copy of all counters."""
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": self.checkout_wait_total_ms / self.checkouts if self.checkouts else 0.0,
+                "checkout_wait_max_ms": self.checkout_wait_max_ms,
+                "checkout_timeouts": self.checkout_timeouts,
+                "query_histogram": list(self.query_histogram),
+                "queries": {key: dict(stats) for key, stats in self.queries.items()},
+            }
+
+
+class ReplicaRouter:
+    """Round-robin choice among the healthy read replicas, shared by all sessions.
+
+    A replica is healthy when its lag query answers and the lag is at most
+    max_lag_seconds. Each result is reused for health_check_seconds. Only one thread
+    probes a replica at a time; the others meanwhile use its previous result, or wait
+    for the first one.
+    """
+
+    def __init__(self, names, max_lag_seconds, health_check_seconds):
+        self._names = list(names)
+        self._max_lag_seconds = max_lag_seconds
+        self._health_check_seconds = health_check_seconds
+        self._lock = threading.Lock()
+        self._probe_locks = {name: threading.Lock() for name in self._names}
+        self._next = 0
+        self._health = {}
+
+    def choose(self, measure_lag):
+        """Name of the next healthy replica, or None; measure_lag(name) returns its lag in seconds."""
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self._names)
+        for name in self._names[start:] + self._names[:start]:
+            if self._check(name, measure_lag)["healthy"]:
+                return name
+        return None
+
+    def _last_check(self, name):
+        """The last health check of a replica and whether it is still fresh."""
+        with self._lock:
+            health = self._health.get(name)
+        return health, bool(health) and time.monotonic() - health["checked_at"] < self._health_check_seconds
+
+    def _check(self, name, measure_lag):
+        health, fresh = self._last_check(name)
+        if fresh:
+            return health
+        probe_lock = self._probe_locks[name]
+        if not probe_lock.acquire(blocking=health is None):
+            return health
+        try:
+            health, fresh = self._last_check(name)
+            if fresh:
+                return health
+            try:
+                lag = float(measure_lag(name))
+                health = {"healthy": lag <= self._max_lag_seconds, "lag_seconds": lag, "error": None}
+            except Exception as e:
+                health = {"healthy": False, "lag_seconds": None, "error": str(e)}
+            health["checked_at"] = time.monotonic()
+            with self._lock:
+                self._health[name] = health
+            return health
+        finally:
+            probe_lock.release()
+
+    def status(self):
+        """Last health check of every replica, for the admin page."""
+        with self._lock:
+            return {name: dict(self._health.get(name, {"healthy": None, "lag_seconds": None, "error": None}))
+                    for name in self._names}
+
+
+class ViewRefresher:
+    """Refreshes the painting_denormalized reporting view in a background thread.
+
+    request() returns at once. Requests made while a refresh runs are folded into one
+    more refresh after it, so a burst of writes costs at most two refreshes. The
+    outcome of the last refresh is kept for the pages that write and the admin page.
+    """
+
+    def __init__(self, refresh):
+        self._refresh = refresh
+        self._lock = threading.Lock()
+        self._running = False
+        self._pending = False
+        self.refreshes = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_refreshed_at = None
+        self.last_seconds = None
+
+    def request(self):
+        with self._lock:
+            if self._running:
+                self._pending = True
+                return
+            self._running = True
+        threading.Thread(target=self._run, name="view-refresher", daemon=True).start()
+
+    def _run(self):
+        while True:
+            started = time.perf_counter()
+            try:
+                self._refresh()
+                with self._lock:
+                    self.refreshes += 1
+                    self.last_error = None
+                    self.last_refreshed_at = time.time()
+                    self.last_seconds = time.perf_counter() - started
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                    self.last_error = str(e)
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                self._pending = False
+
+    def status(self):
+        """Counters and the outcome of the last refresh, for the admin page."""
+        with self._lock:
+            return {
+                "running": self._running,
+                "pending": self._pending,
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "last_refreshed_at": self.last_refreshed_at,
+                "last_seconds": self.last_seconds,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a free connection."""
+
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            if self.metrics:
+                self.metrics.record_checkout(0.0, timed_out=True)
+            raise
+        if self.metrics:
+            self.metrics.record_checkout((time.perf_counter() - started) * 1000)
+        return connection
+
+
+@st.cache_resource
+def get_db_metrics():
+    """Single DatabaseMetrics instance shared by all sessions of this process"""
+    return DatabaseMetrics()
+
+
+def pool_settings():
+    """Pool settings from secrets, falling back to POOL_DEFAULTS."""
+    configured = st.secrets.get("connections", {}).get("postgresql", {}).get("pool", {})
+    return {key: configured.get(key, default) for key, default in POOL_DEFAULTS.items()}
+
+
+def _instrument(engine, metrics):
+    """Attach the latency listeners to the engine (once) and the metrics to its current pool."""
+    engine.pool.metrics = metrics
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+    get_db_metrics().record_query(statement, elapsed_ms)
+
+
+def profiling_settings():
+    """Profiling settings from secrets, falling back to PROFILING_DEFAULTS."""
+    configured = st.secrets.get("profiling", {})
+    return {key: configured.get(key, default) for key, default in PROFILING_DEFAULTS.items()}
+
+
+@st.cache_resource
+def get_query_profiler():
+    """Single QueryProfiler (slow-query log) shared by all sessions of this process"""
+    settings = profiling_settings()
+    return QueryProfiler(settings["log_path"], settings["slow_query_ms"], settings["explain_sample_rate"])
+
+
+@lru_cache(maxsize=None)
+def query_names():
+    """Map the SQL text of every query in queries.py to its name, for the slow-query log."""
+    names = {sql: f"lookup.{entity}" for entity, sql in queries.LOOKUP_QUERIES.items()}
+    names.update({sql: name.lower() for name, sql in vars(queries).items()
+                  if name.isupper() and isinstance(sql, str)})
+    return names
+
+
+class ReplicaConnection(ProfiledConnection):
+    """ProfiledConnection to a read replica; primary is the connection to fall back to."""
+
+    def __init__(self, connection, profiler, names, primary):
+        super().__init__(connection, profiler, names)
+        self.primary = primary
+
+
+def routing_settings():
+    """Read/write splitting settings from secrets, falling back to ROUTING_DEFAULTS."""
+    configured = st.secrets.get("routing", {})
+    return {key: configured.get(key, default) for key, default in ROUTING_DEFAULTS.items()}
+
+
+def _open_connection(name):
+    """st.connection for one [connections.<name>] section, with pool sizing and statement timeout."""
+    settings = pool_settings()
+    conn = st.connection(
+        name,
+        type="sql",
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings["pool_size"],
+        max_overflow=settings["max_overflow"],
+        pool_timeout=settings["pool_timeout"],
+        pool_recycle=settings["pool_recycle"],
+        pool_pre_ping=settings["pool_pre_ping"],
+        connect_args={"options": f"-c statement_timeout={int(settings['statement_timeout_ms'])}",
+                      "connect_timeout": int(settings["connect_timeout"])},
+    )
+    _instrument(conn.engine, get_db_metrics())
+    return conn
+
+
+def get_connection():
+    """The app's connection to the primary, for writes and reads that must see them.
+
+    Returned wrapped in a ProfiledConnection, so every query() and session.execute() is logged.
+    """
+    return ProfiledConnection(_open_connection("postgresql"), get_query_profiler(), query_names())
+
+
+@st.cache_resource
+def get_view_refresher():
+    """Single ViewRefresher of this process, refreshing through the primary's pool"""
+    conn = get_connection()
+
+    def refresh():
+        started = time.perf_counter()
+        with conn.engine.begin() as c:
+            c.exec_driver_sql(REFRESH_VIEW_SQL)
+        conn.record("refresh_painting_denormalized", "CALL refresh_painting_denormalized();", None, None,
+                    (time.perf_counter() - started) * 1000)
+
+    return ViewRefresher(refresh)
+
+
+@st.cache_resource
+def get_replica_router():
+    """Single ReplicaRouter of this process"""
+    settings = routing_settings()
+    return ReplicaRouter(settings["replicas"], settings["max_lag_seconds"], settings["health_check_seconds"])
+
+
+def replica_lag(name):
+    """Replay lag of a replica in seconds; raises if it is not streaming from the primary."""
+    with _open_connection(name).engine.connect() as c:
+        lag = c.exec_driver_sql(REPLICA_LAG_SQL).scalar()
+    if lag is None:
+        raise RuntimeError("WAL receiver is not streaming from the primary")
+    return lag
+
+
+def note_write():
+    """Remember that this session just wrote, so its next reads go to the primary."""
+    st.session_state.last_write_at = time.time()
+
+
+def get_read_connection():
+    """Connection for read-only pages: a healthy replica (round-robin), else the primary.
+
+    Sessions that wrote within read_your_writes_seconds read from the primary, so
+    they see their own changes even on a lagging replica.
+    """
+    settings = routing_settings()
+    primary = get_connection()
+    if not settings["replicas"]:
+        return primary
+    if time.time() - st.session_state.get("last_write_at", 0) < settings["read_your_writes_seconds"]:
+        return primary
+    name = get_replica_router().choose(replica_lag)
+    if name is None:
+        return primary
+    return ReplicaConnection(_open_connection(name), get_query_profiler(), query_names(), primary)
+
+
+@lru_cache(maxsize=None)
+def prepared_form(sql):
+    """Rewrite the :name placeholders of a query to $1, $2, ...
+
+    Returns the statement for PREPARE and the parameter names in placeholder order.
+    """
+    order = []
+
+    def number(match):
+        if match.group(1) not in order:
+            order.append(match.group(1))
+        return f"${order.index(match.group(1)) + 1}"
+
+    return PLACEHOLDER.sub(number, sql.strip().rstrip(";")), tuple(order)
+
+
+def statement_name(sql):
+    """Name of the prepared statement of a query: its name in queries.py, else a hash of its text.
+
+    Two different statements never share a name, even when their first words match.
+    """
+    name = query_names().get(sql)
+    if name is None:
+        return "q_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+    return re.sub(r"\W", "_", name)
+
+
+def run_prepared(conn, sql, params=None):
+    """Run a query from queries.py as a server-side prepared statement; returns a DataFrame.
+
+    Each pooled connection PREPAREs a statement on its first use and only EXECUTEs it
+    afterwards, so PostgreSQL parses and plans it once per connection instead of on
+    every rerun. The query is logged under its name in queries.py; SQL not defined there
+    is prepared under a hash of its text (statement_name).
+    """
+    name = conn.query_name(sql)
+    prepared_name = statement_name(sql)
+    statement, order = prepared_form(sql)
+    params = params or {}
+    execute = f"EXECUTE {prepared_name}"
+    if order:
+        execute += "(" + ", ".join(f"%({key})s" for key in order) + ")"
+
+    started = time.perf_counter()
+    with conn.engine.connect() as c:
+        # Prepared statements live as long as the DBAPI connection, and so does its info dict
+        prepared = c.connection.info.setdefault("prepared_statements", set())
+        for attempt in range(2):
+            try:
+                if prepared_name not in prepared:
+                    c.exec_driver_sql(f"PREPARE {prepared_name} AS {statement}")
+                    prepared.add(prepared_name)
+                result = c.exec_driver_sql(execute, {key: params[key] for key in order})
+                break
+            except DBAPIError as e:
+                if attempt or getattr(e.orig, "pgcode", None) not in REPREPARE_ERRORS:
+                    raise
+                c.rollback()
+                c.exec_driver_sql("DEALLOCATE ALL")
+                prepared.clear()
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    conn.record(name, sql, params, len(df), (time.perf_counter() - started) * 1000)
+    return df
+
+
+@st.cache_resource
+def get_change_listener():
+    """Single ChangeListener thread of this process, on its own connection outside the pool"""
+    engine = get_connection().engine
+    args, kwargs = engine.dialect.create_connect_args(engine.url)
+    listener = ChangeListener(lambda: engine.dialect.loaded_dbapi.connect(*args, **kwargs))
+    listener.start()
+    return listener
+
+
+@st.cache_resource
+def get_result_cache():
+    """Process-wide cache of query results, shared by all sessions"""
+    listener = get_change_listener()
+    cache = LookupCache(default_ttl=RESULT_CACHE_TTL, max_entries=RESULT_CACHE_MAX_ENTRIES)
+
+    def drop_outdated(tables):
+        # Keys carry the tables and the versions they were read at (see run_cached)
+        outdated = [key for key in cache.keys() if key[3] != listener.version(key[2])]
+        if outdated:
+            cache.invalidate(*outdated)
+
+    listener.subscribe(drop_outdated)
+    return cache
+
+
+def run_query(conn, sql, params=None, name=None):
+    """Run SQL built at run time on a pooled connection and log it; returns a DataFrame.
+
+    Unlike conn.query() this uses no Streamlit cache, so it may run on a worker thread.
+    """
+    started = time.perf_counter()
+    with conn.engine.connect() as c:
+        result = c.execute(text(sql), params or {})
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    conn.record(name, sql, params, len(df), (time.perf_counter() - started) * 1000)
+    return df
+
+
+def current_connection(conn, tables):
+    """conn, or its primary if conn is a replica that may not have replayed a recent change to tables.
+
+    Call from the script thread: it looks up the change listener and routing settings.
+    """
+    listener = get_change_listener()
+    # A replica may not have replayed a change the listener has already seen yet
+    if isinstance(conn, ReplicaConnection) and listener.connected and \
+            listener.seconds_since_change(tuple(tables)) < routing_settings()["max_lag_seconds"]:
+        return conn.primary
+    return conn
+
+
+def cached_call(conn, sql, params=None, tables=None, name=None):
+    """A zero-argument callable doing run_cached(conn, sql, params, tables, name).
+
+    The change listener, routing settings and result cache are looked up right away,
+    in the script thread, so the callable itself can run on a run_concurrently worker.
+    """
+    def run(conn):
+        if name is None:
+            return run_prepared(conn, sql, params)
+        return run_query(conn, sql, params, name)
+
+    listener = get_change_listener()
+    if not listener.connected:
+        return lambda: run(conn)
+    tables = tuple(tables or queries.QUERY_TABLES[sql])
+    conn = current_connection(conn, tables)
+    bound = tuple(sorted((key, tuple(value) if isinstance(value, list) else value)
+                         for key, value in (params or {}).items()))
+    key = (sql, bound, tables, listener.version(tables))
+    cache = get_result_cache()
+    return lambda: cache.get(key, lambda: run(conn))
+
+
+def run_cached(conn, sql, params=None, tables=None, name=None):
+    """run_prepared(), cached until one of the tables in queries.QUERY_TABLES[sql] changes.
+
+    The cache key includes the listener's version of those tables, so a notification
+    makes the next call read from the database. Without a live listener nothing is cached.
+    Queries built at run time (e.g. the Advanced Search facets) pass the tables they read
+    and a log name instead, and run through run_query().
+    """
+    return cached_call(conn, sql, params, tables, name)()
+
+
+@st.cache_resource
+def get_query_executor():
+    """Process-wide thread pool for independent page queries, sized like the connection pool"""
+    return ThreadPoolExecutor(max_workers=pool_settings()["pool_size"], thread_name_prefix="query")
+
+
+def run_concurrently(calls):
+    """Run independent queries at the same time and return their results by key.
+
+    calls maps a key to a zero-argument callable (e.g. a lambda around run_prepared, or
+    a cached_call). Each runs on its own pooled connection, so a page waits for its
+    slowest query instead of the sum of all of them. The callables run outside the
+    script thread, so they must not use Streamlit commands, st.secrets or Streamlit
+    caches (st.cache_resource helpers, conn.query); resolve those before the call.
+    """
+    executor = get_query_executor()
+    futures = {key: executor.submit(call) for key, call in calls.items()}
+    return {key: future.result() for key, future in futures.items()}
+
+
+def pool_status(engine):
+    """Live pool gauges for the admin page."""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+    }
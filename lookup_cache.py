@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Fallback lifetime (seconds) for entities without an explicit TTL
+DEFAULT_TTL = 300
+
+
+class LookupCache:
+    """Process-wide cache for small lookup lists (countries, cities, artists, styles).
+
+    Entries expire after a per-entity TTL and can be dropped explicitly with
+    invalidate() whenever a write touches the underlying table. A value whose load
+    overlapped an invalidate() of its entity is returned but not stored, since it may
+    predate the write. With max_entries given, storing a value beyond that many entries
+    evicts the least recently used one. The cache is shared by all sessions, so cached
+    values must be treated as read-only.
+    """
+
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL, max_entries=None):
+        self._ttls = dict(ttls or {})
+        self._default_ttl = default_ttl
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        # Entities being loaded -> [loads in flight, invalidations since the first began];
+        # _generation counts invalidations of everything
+        self._loading = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, entity, loader):
+        """Return the cached value for entity, calling loader() on a miss or after expiry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(entity)
+            if entry is not None and now < entry[0]:
+                self.hits += 1
+                self._entries.move_to_end(entity)
+                return entry[1]
+            self.misses += 1
+            loading = self._loading.setdefault(entity, [0, 0])
+            loading[0] += 1
+            generation = (self._generation, loading[1])
+
+        try:
+            value = loader()
+        except BaseException:
+            with self._lock:
+                self._loaded(entity, loading)
+            raise
+        with self._lock:
+            self._loaded(entity, loading)
+            if generation == (self._generation, loading[1]):
+                self._entries[entity] = (now + self._ttls.get(entity, self._default_ttl), value)
+                self._entries.move_to_end(entity)
+                while self._max_entries is not None and len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def _loaded(self, entity, loading):
+        loading[0] -= 1
+        if loading[0] == 0:
+            del self._loading[entity]
+
+    def invalidate(self, *entities):
+        """Drop the given entities (or everything if none are given)."""
+        with self._lock:
+            if not entities:
+                self._entries.clear()
+                self._generation += 1
+            for entity in entities:
+                self._entries.pop(entity, None)
+                if entity in self._loading:
+                    self._loading[entity][1] += 1
+
+    def keys(self):
+        """Return the currently cached entities."""
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the currently cached entities."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entities": sorted(self._entries),
+            }
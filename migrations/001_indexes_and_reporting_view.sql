@@ -0,0 +1,67 @@
+-- ==========================================
+-- Migration 001: Supporting indexes and reporting view
+-- Painters & Paintings Database
+-- ==========================================
+
+-- ==========================================
+-- INDEXES for the lookups used by the app
+-- ==========================================
+
+-- Relationship tables: the primary keys lead with artist_id / city key,
+-- so joins on the painting side need their own index
+CREATE INDEX IF NOT EXISTS idx_painted_painting_serial_number ON painted (painting_serial_number);
+CREATE INDEX IF NOT EXISTS idx_visitable_painting_serial_number ON visitable (painting_serial_number);
+
+-- Filter and sort columns
+CREATE INDEX IF NOT EXISTS idx_painting_style_type ON painting (style_type);
+CREATE INDEX IF NOT EXISTS idx_painting_year_created ON painting (year_created);
+CREATE INDEX IF NOT EXISTS idx_city_name ON city (name);
+CREATE INDEX IF NOT EXISTS idx_country_country_name ON country (country_name);
+-- Artist names: the sort order of the artists lookup and the name matching of the bulk import
+CREATE INDEX IF NOT EXISTS idx_artist_name ON artist (last_name, first_name);
+
+-- Expression index for the computed artist display name
+CREATE INDEX IF NOT EXISTS idx_artist_full_name ON artist ((first_name || ' ' || last_name));
+
+-- ==========================================
+-- MATERIALIZED VIEW: painting with artist, city and country pre-joined
+-- ==========================================
+CREATE MATERIALIZED VIEW IF NOT EXISTS painting_denormalized AS
+SELECT
+    p.serial_number,
+    p.title,
+    p.style_type,
+    p.year_created,
+    p.wikipedia_url,
+    a.id AS artist_id,
+    a.first_name || ' ' || a.last_name AS artist_name,
+    c.country_iso AS city_country_iso,
+    c.zipcode AS city_zipcode,
+    c.name AS city_name,
+    co.iso AS country_iso,
+    co.country_name
+FROM painting p
+JOIN painted pt ON p.serial_number = pt.painting_serial_number
+JOIN artist a ON pt.artist_id = a.id
+JOIN visitable v ON p.serial_number = v.painting_serial_number
+JOIN city c ON v.city_country_iso = c.country_iso AND v.city_zipcode = c.zipcode
+JOIN country co ON c.country_iso = co.iso;
+
+-- Unique index (required for REFRESH ... CONCURRENTLY) doubling as the keyset pagination index
+CREATE UNIQUE INDEX IF NOT EXISTS idx_painting_denormalized_key
+    ON painting_denormalized (serial_number, artist_id, city_country_iso, city_zipcode);
+CREATE INDEX IF NOT EXISTS idx_painting_denormalized_style_type ON painting_denormalized (style_type);
+CREATE INDEX IF NOT EXISTS idx_painting_denormalized_artist_id ON painting_denormalized (artist_id);
+CREATE INDEX IF NOT EXISTS idx_painting_denormalized_city ON painting_denormalized (city_country_iso, city_zipcode);
+CREATE INDEX IF NOT EXISTS idx_painting_denormalized_year_title ON painting_denormalized (year_created, title);
+
+-- ==========================================
+-- REFRESH procedure (call after writes to the underlying tables)
+-- ==========================================
+CREATE OR REPLACE PROCEDURE refresh_painting_denormalized()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY painting_denormalized;
+END;
+$$;
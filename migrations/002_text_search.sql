@@ -0,0 +1,78 @@
+-- ==========================================
+-- Migration 002: Full-text and fuzzy search on titles and artist names
+-- Painters & Paintings Database
+-- ==========================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ==========================================
+-- TSVECTOR column on painting, maintained by trigger
+-- ==========================================
+ALTER TABLE painting ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE OR REPLACE FUNCTION painting_search_vector_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.search_vector := to_tsvector('simple', coalesce(NEW.title, ''));
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_painting_search_vector ON painting;
+CREATE TRIGGER trg_painting_search_vector
+    BEFORE INSERT OR UPDATE OF title ON painting
+    FOR EACH ROW EXECUTE FUNCTION painting_search_vector_update();
+
+-- Backfill existing rows
+UPDATE painting SET search_vector = to_tsvector('simple', title) WHERE search_vector IS NULL;
+
+-- ==========================================
+-- SEARCH_WORD: vocabulary of title words, used to correct misspelled search terms.
+-- Fuzzy matching a typo against this small table is much cheaper than against
+-- every title. Words are only ever added; stale words simply match nothing.
+-- ==========================================
+CREATE TABLE IF NOT EXISTS search_word (
+    word TEXT PRIMARY KEY
+);
+
+CREATE OR REPLACE FUNCTION search_word_collect()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO search_word (word)
+    SELECT DISTINCT unnest(tsvector_to_array(search_vector)) FROM new_paintings
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_painting_search_word_insert ON painting;
+CREATE TRIGGER trg_painting_search_word_insert
+    AFTER INSERT ON painting
+    REFERENCING NEW TABLE AS new_paintings
+    FOR EACH STATEMENT EXECUTE FUNCTION search_word_collect();
+
+DROP TRIGGER IF EXISTS trg_painting_search_word_update ON painting;
+CREATE TRIGGER trg_painting_search_word_update
+    AFTER UPDATE ON painting
+    REFERENCING NEW TABLE AS new_paintings
+    FOR EACH STATEMENT EXECUTE FUNCTION search_word_collect();
+
+-- Backfill existing words
+INSERT INTO search_word (word)
+SELECT word FROM ts_stat('SELECT search_vector FROM painting')
+ON CONFLICT DO NOTHING;
+
+-- ==========================================
+-- INDEXES
+-- ==========================================
+
+-- Prefix matching on title words
+CREATE INDEX IF NOT EXISTS idx_painting_search_vector ON painting USING GIN (search_vector);
+
+-- Fuzzy matching (typos, partial words) on the title vocabulary and on artist names
+CREATE INDEX IF NOT EXISTS idx_search_word_trgm ON search_word USING GIN (word gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_artist_full_name_trgm ON artist USING GIN ((first_name || ' ' || last_name) gin_trgm_ops);
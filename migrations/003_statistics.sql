@@ -0,0 +1,196 @@
+-- ==========================================
+-- Migration 003: Incrementally maintained painting counts
+-- Painters & Paintings Database
+-- ==========================================
+
+-- ==========================================
+-- STATISTICS TABLES: paintings per artist, city, country, style and decade.
+-- Statement-level triggers on painted, visitable and painting apply the net change
+-- of every write, so reading a count never re-aggregates the catalog.
+-- Rows whose count drops to zero are removed.
+-- ==========================================
+CREATE TABLE IF NOT EXISTS artist_stat (
+    artist_id INTEGER PRIMARY KEY,
+    paintings BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS city_stat (
+    country_iso CHAR(2) NOT NULL,
+    zipcode VARCHAR(10) NOT NULL,
+    paintings BIGINT NOT NULL,
+    PRIMARY KEY (country_iso, zipcode)
+);
+
+CREATE TABLE IF NOT EXISTS country_stat (
+    country_iso CHAR(2) PRIMARY KEY,
+    paintings BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS style_stat (
+    style_type VARCHAR(50) PRIMARY KEY,
+    paintings BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS decade_stat (
+    decade INTEGER PRIMARY KEY,  -- NULL year_created is counted under decade -1
+    paintings BIGINT NOT NULL
+);
+
+-- Top-N lists on the dashboard
+CREATE INDEX IF NOT EXISTS idx_artist_stat_paintings ON artist_stat (paintings DESC);
+CREATE INDEX IF NOT EXISTS idx_city_stat_paintings ON city_stat (paintings DESC);
+
+-- ==========================================
+-- TRIGGER FUNCTIONS: each is attached to the INSERT (new_rows), UPDATE (old_rows
+-- and new_rows) and DELETE (old_rows) triggers of its table
+-- ==========================================
+CREATE OR REPLACE FUNCTION painted_stat_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO artist_stat (artist_id, paintings)
+        SELECT artist_id, count(*) FROM new_rows GROUP BY artist_id
+        ON CONFLICT (artist_id) DO UPDATE SET paintings = artist_stat.paintings + EXCLUDED.paintings;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE artist_stat s SET paintings = s.paintings - d.paintings
+        FROM (SELECT artist_id, count(*) AS paintings FROM old_rows GROUP BY artist_id) d
+        WHERE s.artist_id = d.artist_id;
+        DELETE FROM artist_stat WHERE paintings <= 0 AND artist_id IN (SELECT artist_id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION visitable_stat_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO city_stat (country_iso, zipcode, paintings)
+        SELECT city_country_iso, city_zipcode, count(*) FROM new_rows GROUP BY city_country_iso, city_zipcode
+        ON CONFLICT (country_iso, zipcode) DO UPDATE SET paintings = city_stat.paintings + EXCLUDED.paintings;
+
+        INSERT INTO country_stat (country_iso, paintings)
+        SELECT city_country_iso, count(*) FROM new_rows GROUP BY city_country_iso
+        ON CONFLICT (country_iso) DO UPDATE SET paintings = country_stat.paintings + EXCLUDED.paintings;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE city_stat s SET paintings = s.paintings - d.paintings
+        FROM (SELECT city_country_iso, city_zipcode, count(*) AS paintings
+              FROM old_rows GROUP BY city_country_iso, city_zipcode) d
+        WHERE s.country_iso = d.city_country_iso AND s.zipcode = d.city_zipcode;
+        DELETE FROM city_stat WHERE paintings <= 0
+            AND (country_iso, zipcode) IN (SELECT city_country_iso, city_zipcode FROM old_rows);
+
+        UPDATE country_stat s SET paintings = s.paintings - d.paintings
+        FROM (SELECT city_country_iso, count(*) AS paintings FROM old_rows GROUP BY city_country_iso) d
+        WHERE s.country_iso = d.city_country_iso;
+        DELETE FROM country_stat WHERE paintings <= 0 AND country_iso IN (SELECT city_country_iso FROM old_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION painting_stat_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO style_stat (style_type, paintings)
+        SELECT style_type, count(*) FROM new_rows GROUP BY style_type
+        ON CONFLICT (style_type) DO UPDATE SET paintings = style_stat.paintings + EXCLUDED.paintings;
+
+        INSERT INTO decade_stat (decade, paintings)
+        SELECT coalesce(year_created / 10 * 10, -1), count(*) FROM new_rows GROUP BY 1
+        ON CONFLICT (decade) DO UPDATE SET paintings = decade_stat.paintings + EXCLUDED.paintings;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE style_stat s SET paintings = s.paintings - d.paintings
+        FROM (SELECT style_type, count(*) AS paintings FROM old_rows GROUP BY style_type) d
+        WHERE s.style_type = d.style_type;
+        DELETE FROM style_stat WHERE paintings <= 0 AND style_type IN (SELECT style_type FROM old_rows);
+
+        UPDATE decade_stat s SET paintings = s.paintings - d.paintings
+        FROM (SELECT coalesce(year_created / 10 * 10, -1) AS decade, count(*) AS paintings
+              FROM old_rows GROUP BY 1) d
+        WHERE s.decade = d.decade;
+        DELETE FROM decade_stat WHERE paintings <= 0;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- ==========================================
+-- TRIGGERS (transition tables allow only one event per trigger)
+-- ==========================================
+DROP TRIGGER IF EXISTS trg_painted_stat_insert ON painted;
+CREATE TRIGGER trg_painted_stat_insert
+    AFTER INSERT ON painted REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painted_stat_update();
+DROP TRIGGER IF EXISTS trg_painted_stat_update ON painted;
+CREATE TRIGGER trg_painted_stat_update
+    AFTER UPDATE ON painted REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painted_stat_update();
+DROP TRIGGER IF EXISTS trg_painted_stat_delete ON painted;
+CREATE TRIGGER trg_painted_stat_delete
+    AFTER DELETE ON painted REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painted_stat_update();
+
+DROP TRIGGER IF EXISTS trg_visitable_stat_insert ON visitable;
+CREATE TRIGGER trg_visitable_stat_insert
+    AFTER INSERT ON visitable REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION visitable_stat_update();
+DROP TRIGGER IF EXISTS trg_visitable_stat_update ON visitable;
+CREATE TRIGGER trg_visitable_stat_update
+    AFTER UPDATE ON visitable REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION visitable_stat_update();
+DROP TRIGGER IF EXISTS trg_visitable_stat_delete ON visitable;
+CREATE TRIGGER trg_visitable_stat_delete
+    AFTER DELETE ON visitable REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION visitable_stat_update();
+
+DROP TRIGGER IF EXISTS trg_painting_stat_insert ON painting;
+CREATE TRIGGER trg_painting_stat_insert
+    AFTER INSERT ON painting REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painting_stat_update();
+DROP TRIGGER IF EXISTS trg_painting_stat_update ON painting;
+CREATE TRIGGER trg_painting_stat_update
+    AFTER UPDATE ON painting REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painting_stat_update();
+DROP TRIGGER IF EXISTS trg_painting_stat_delete ON painting;
+CREATE TRIGGER trg_painting_stat_delete
+    AFTER DELETE ON painting REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painting_stat_update();
+
+-- ==========================================
+-- REBUILD procedure: recompute all counts from scratch (backfill, or repair after TRUNCATE)
+-- ==========================================
+CREATE OR REPLACE PROCEDURE rebuild_statistics()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    TRUNCATE artist_stat, city_stat, country_stat, style_stat, decade_stat;
+
+    INSERT INTO artist_stat (artist_id, paintings)
+    SELECT artist_id, count(*) FROM painted GROUP BY artist_id;
+
+    INSERT INTO city_stat (country_iso, zipcode, paintings)
+    SELECT city_country_iso, city_zipcode, count(*) FROM visitable GROUP BY city_country_iso, city_zipcode;
+
+    INSERT INTO country_stat (country_iso, paintings)
+    SELECT city_country_iso, count(*) FROM visitable GROUP BY city_country_iso;
+
+    INSERT INTO style_stat (style_type, paintings)
+    SELECT style_type, count(*) FROM painting GROUP BY style_type;
+
+    INSERT INTO decade_stat (decade, paintings)
+    SELECT coalesce(year_created / 10 * 10, -1), count(*) FROM painting GROUP BY 1;
+END;
+$$;
+
+CALL rebuild_statistics();
@@ -0,0 +1,63 @@
+-- ==========================================
+-- Migration 004: Change notifications for cache invalidation
+-- Painters & Paintings Database
+-- ==========================================
+
+-- ==========================================
+-- Every write to a catalog table sends NOTIFY catalog_changes with the table name as
+-- payload, delivered when the transaction commits. The app's listener thread
+-- (change_listener.py) uses it to drop cached results that read the table.
+-- PostgreSQL folds identical notifications of one transaction into one.
+-- ==========================================
+CREATE OR REPLACE FUNCTION notify_catalog_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('catalog_changes', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_country_notify ON country;
+CREATE TRIGGER trg_country_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON country
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change();
+
+DROP TRIGGER IF EXISTS trg_city_notify ON city;
+CREATE TRIGGER trg_city_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON city
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change();
+
+DROP TRIGGER IF EXISTS trg_artist_notify ON artist;
+CREATE TRIGGER trg_artist_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON artist
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change();
+
+DROP TRIGGER IF EXISTS trg_painting_notify ON painting;
+CREATE TRIGGER trg_painting_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON painting
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change();
+
+DROP TRIGGER IF EXISTS trg_painted_notify ON painted;
+CREATE TRIGGER trg_painted_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON painted
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change();
+
+DROP TRIGGER IF EXISTS trg_visitable_notify ON visitable;
+CREATE TRIGGER trg_visitable_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON visitable
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change();
+
+-- ==========================================
+-- The reporting view is refreshed after the write has committed, so its refresh
+-- announces itself separately
+-- ==========================================
+CREATE OR REPLACE PROCEDURE refresh_painting_denormalized()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY painting_denormalized;
+    PERFORM pg_notify('catalog_changes', 'painting_denormalized');
+END;
+$$;
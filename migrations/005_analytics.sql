@@ -0,0 +1,249 @@
+-- ==========================================
+-- Migration 005: Rollups for the Analytics page
+-- Painters & Paintings Database
+-- ==========================================
+
+-- ==========================================
+-- ROLLUP TABLES: paintings per city, country and style by decade of year_created
+-- (NULL years under decade -1, as in decade_stat), and artists born and died per decade
+-- ==========================================
+CREATE TABLE IF NOT EXISTS city_decade_stat (
+    country_iso CHAR(2) NOT NULL,
+    zipcode VARCHAR(10) NOT NULL,
+    decade INTEGER NOT NULL,
+    paintings BIGINT NOT NULL,
+    PRIMARY KEY (country_iso, zipcode, decade)
+);
+
+CREATE TABLE IF NOT EXISTS country_decade_stat (
+    country_iso CHAR(2) NOT NULL,
+    decade INTEGER NOT NULL,
+    paintings BIGINT NOT NULL,
+    PRIMARY KEY (country_iso, decade)
+);
+
+CREATE TABLE IF NOT EXISTS style_decade_stat (
+    style_type VARCHAR(50) NOT NULL,
+    decade INTEGER NOT NULL,
+    paintings BIGINT NOT NULL,
+    PRIMARY KEY (style_type, decade)
+);
+
+-- Artists without a birth year are left out; those still alive are never counted as died
+CREATE TABLE IF NOT EXISTS artist_decade_stat (
+    decade INTEGER PRIMARY KEY,
+    born BIGINT NOT NULL,
+    died BIGINT NOT NULL
+);
+
+-- ==========================================
+-- PLACE ROLLUPS: a painting's place (visitable) and year (painting) live in two
+-- tables, and a painting delete removes its visitable rows by cascade after the
+-- painting is gone. New visitable rows are added as a delta; every other change
+-- recounts the affected cities from scratch, which is correct whatever the order
+-- of the two tables' triggers. Countries are summed up from their cities.
+-- ==========================================
+CREATE OR REPLACE FUNCTION recount_place_decades(country_isos CHAR(2)[], zipcodes VARCHAR(10)[])
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM city_decade_stat s
+    USING unnest(country_isos, zipcodes) AS c(country_iso, zipcode)
+    WHERE s.country_iso = c.country_iso AND s.zipcode = c.zipcode;
+
+    INSERT INTO city_decade_stat (country_iso, zipcode, decade, paintings)
+    SELECT v.city_country_iso, v.city_zipcode, coalesce(p.year_created / 10 * 10, -1), count(*)
+    FROM (SELECT DISTINCT * FROM unnest(country_isos, zipcodes)) AS c(country_iso, zipcode)
+    JOIN visitable v ON v.city_country_iso = c.country_iso AND v.city_zipcode = c.zipcode
+    JOIN painting p ON p.serial_number = v.painting_serial_number
+    GROUP BY 1, 2, 3;
+
+    DELETE FROM country_decade_stat WHERE country_iso = ANY(country_isos);
+
+    INSERT INTO country_decade_stat (country_iso, decade, paintings)
+    SELECT country_iso, decade, sum(paintings)
+    FROM city_decade_stat WHERE country_iso = ANY(country_isos)
+    GROUP BY country_iso, decade;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION visitable_analytics_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    country_isos CHAR(2)[];
+    zipcodes VARCHAR(10)[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO city_decade_stat (country_iso, zipcode, decade, paintings)
+        SELECT n.city_country_iso, n.city_zipcode, coalesce(p.year_created / 10 * 10, -1), count(*)
+        FROM new_rows n JOIN painting p ON p.serial_number = n.painting_serial_number
+        GROUP BY 1, 2, 3
+        ON CONFLICT (country_iso, zipcode, decade)
+        DO UPDATE SET paintings = city_decade_stat.paintings + EXCLUDED.paintings;
+
+        INSERT INTO country_decade_stat (country_iso, decade, paintings)
+        SELECT n.city_country_iso, coalesce(p.year_created / 10 * 10, -1), count(*)
+        FROM new_rows n JOIN painting p ON p.serial_number = n.painting_serial_number
+        GROUP BY 1, 2
+        ON CONFLICT (country_iso, decade)
+        DO UPDATE SET paintings = country_decade_stat.paintings + EXCLUDED.paintings;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(city_country_iso), array_agg(city_zipcode) INTO country_isos, zipcodes
+        FROM (SELECT city_country_iso, city_zipcode FROM old_rows
+              UNION SELECT city_country_iso, city_zipcode FROM new_rows) c;
+        PERFORM recount_place_decades(country_isos, zipcodes);
+    ELSE
+        SELECT array_agg(city_country_iso), array_agg(city_zipcode) INTO country_isos, zipcodes
+        FROM (SELECT DISTINCT city_country_iso, city_zipcode FROM old_rows) c;
+        PERFORM recount_place_decades(country_isos, zipcodes);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- ==========================================
+-- PAINTING: styles by decade are a plain delta. A changed year moves the painting's
+-- place counts, so the cities of updated paintings are recounted.
+-- ==========================================
+CREATE OR REPLACE FUNCTION painting_analytics_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    country_isos CHAR(2)[];
+    zipcodes VARCHAR(10)[];
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO style_decade_stat (style_type, decade, paintings)
+        SELECT style_type, coalesce(year_created / 10 * 10, -1), count(*) FROM new_rows GROUP BY 1, 2
+        ON CONFLICT (style_type, decade) DO UPDATE SET paintings = style_decade_stat.paintings + EXCLUDED.paintings;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE style_decade_stat s SET paintings = s.paintings - d.paintings
+        FROM (SELECT style_type, coalesce(year_created / 10 * 10, -1) AS decade, count(*) AS paintings
+              FROM old_rows GROUP BY 1, 2) d
+        WHERE s.style_type = d.style_type AND s.decade = d.decade;
+        DELETE FROM style_decade_stat WHERE paintings <= 0;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(city_country_iso), array_agg(city_zipcode) INTO country_isos, zipcodes
+        FROM (SELECT DISTINCT v.city_country_iso, v.city_zipcode
+              FROM old_rows o
+              JOIN new_rows n ON n.serial_number = o.serial_number
+              JOIN visitable v ON v.painting_serial_number = o.serial_number
+              WHERE o.year_created IS DISTINCT FROM n.year_created) c;
+        IF country_isos IS NOT NULL THEN
+            PERFORM recount_place_decades(country_isos, zipcodes);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- ==========================================
+-- ARTIST: born and died per decade, a plain delta
+-- ==========================================
+CREATE OR REPLACE FUNCTION artist_analytics_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO artist_decade_stat (decade, born, died)
+        SELECT decade, sum(born), sum(died) FROM (
+            SELECT birth_year / 10 * 10 AS decade, 1 AS born, 0 AS died FROM new_rows WHERE birth_year IS NOT NULL
+            UNION ALL
+            SELECT death_year / 10 * 10, 0, 1 FROM new_rows WHERE birth_year IS NOT NULL AND death_year IS NOT NULL
+        ) d GROUP BY decade
+        ON CONFLICT (decade) DO UPDATE
+        SET born = artist_decade_stat.born + EXCLUDED.born, died = artist_decade_stat.died + EXCLUDED.died;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE artist_decade_stat s SET born = s.born - d.born, died = s.died - d.died
+        FROM (SELECT decade, sum(born) AS born, sum(died) AS died FROM (
+                  SELECT birth_year / 10 * 10 AS decade, 1 AS born, 0 AS died FROM old_rows WHERE birth_year IS NOT NULL
+                  UNION ALL
+                  SELECT death_year / 10 * 10, 0, 1 FROM old_rows WHERE birth_year IS NOT NULL AND death_year IS NOT NULL
+              ) o GROUP BY decade) d
+        WHERE s.decade = d.decade;
+        DELETE FROM artist_decade_stat WHERE born <= 0 AND died <= 0;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- ==========================================
+-- TRIGGERS (transition tables allow only one event per trigger)
+-- ==========================================
+DROP TRIGGER IF EXISTS trg_visitable_analytics_insert ON visitable;
+CREATE TRIGGER trg_visitable_analytics_insert
+    AFTER INSERT ON visitable REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION visitable_analytics_update();
+DROP TRIGGER IF EXISTS trg_visitable_analytics_update ON visitable;
+CREATE TRIGGER trg_visitable_analytics_update
+    AFTER UPDATE ON visitable REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION visitable_analytics_update();
+DROP TRIGGER IF EXISTS trg_visitable_analytics_delete ON visitable;
+CREATE TRIGGER trg_visitable_analytics_delete
+    AFTER DELETE ON visitable REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION visitable_analytics_update();
+
+DROP TRIGGER IF EXISTS trg_painting_analytics_insert ON painting;
+CREATE TRIGGER trg_painting_analytics_insert
+    AFTER INSERT ON painting REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painting_analytics_update();
+DROP TRIGGER IF EXISTS trg_painting_analytics_update ON painting;
+CREATE TRIGGER trg_painting_analytics_update
+    AFTER UPDATE ON painting REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painting_analytics_update();
+DROP TRIGGER IF EXISTS trg_painting_analytics_delete ON painting;
+CREATE TRIGGER trg_painting_analytics_delete
+    AFTER DELETE ON painting REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painting_analytics_update();
+
+DROP TRIGGER IF EXISTS trg_artist_analytics_insert ON artist;
+CREATE TRIGGER trg_artist_analytics_insert
+    AFTER INSERT ON artist REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION artist_analytics_update();
+DROP TRIGGER IF EXISTS trg_artist_analytics_update ON artist;
+CREATE TRIGGER trg_artist_analytics_update
+    AFTER UPDATE ON artist REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION artist_analytics_update();
+DROP TRIGGER IF EXISTS trg_artist_analytics_delete ON artist;
+CREATE TRIGGER trg_artist_analytics_delete
+    AFTER DELETE ON artist REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION artist_analytics_update();
+
+-- ==========================================
+-- REBUILD procedure: recompute all rollups from scratch (backfill, or repair after TRUNCATE)
+-- ==========================================
+CREATE OR REPLACE PROCEDURE rebuild_analytics()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    TRUNCATE city_decade_stat, country_decade_stat, style_decade_stat, artist_decade_stat;
+
+    INSERT INTO city_decade_stat (country_iso, zipcode, decade, paintings)
+    SELECT v.city_country_iso, v.city_zipcode, coalesce(p.year_created / 10 * 10, -1), count(*)
+    FROM visitable v JOIN painting p ON p.serial_number = v.painting_serial_number
+    GROUP BY 1, 2, 3;
+
+    INSERT INTO country_decade_stat (country_iso, decade, paintings)
+    SELECT country_iso, decade, sum(paintings) FROM city_decade_stat GROUP BY country_iso, decade;
+
+    INSERT INTO style_decade_stat (style_type, decade, paintings)
+    SELECT style_type, coalesce(year_created / 10 * 10, -1), count(*) FROM painting GROUP BY 1, 2;
+
+    INSERT INTO artist_decade_stat (decade, born, died)
+    SELECT decade, sum(born), sum(died) FROM (
+        SELECT birth_year / 10 * 10 AS decade, 1 AS born, 0 AS died FROM artist WHERE birth_year IS NOT NULL
+        UNION ALL
+        SELECT death_year / 10 * 10, 0, 1 FROM artist WHERE birth_year IS NOT NULL AND death_year IS NOT NULL
+    ) d GROUP BY decade;
+END;
+$$;
+
+CALL rebuild_analytics();
@@ -0,0 +1,239 @@
+-- ==========================================
+-- Optional migration: list-partition painting by style_type
+-- Painters & Paintings Database
+-- Applied by `python setup_db.py --partitioned`, after the numbered migrations.
+-- ==========================================
+
+-- ==========================================
+-- PARTITIONED PAINTING: one partition per style of the Add Painting form, plus a
+-- default partition for any other style. Queries on painting that filter by style
+-- are pruned to that partition; the app's style views read painting_denormalized,
+-- which is not partitioned, so they are not.
+--
+-- A primary key must contain the partition key, so painting's key becomes
+-- (serial_number, style_type). serial_number stays unique through the painting_serial
+-- table below. painted and visitable get a painting_style_type column for their
+-- foreign keys, which a trigger fills in, so inserts into them stay unchanged.
+--
+-- Needs PostgreSQL 15 or later: older servers run a style change (an UPDATE that moves
+-- the row to another partition) as DELETE plus INSERT, so ON DELETE CASCADE would
+-- delete the painting's links instead of ON UPDATE CASCADE updating them.
+--
+-- The existing table is converted in place: its rows are copied, and its indexes,
+-- triggers and the reporting view are re-created from their current definitions.
+-- ==========================================
+
+-- Keep the definitions of everything that depends on painting before it goes away
+CREATE TEMPORARY TABLE painting_dependent (
+    ordinal SERIAL,
+    definition TEXT NOT NULL
+) ON COMMIT DROP;
+
+INSERT INTO painting_dependent (definition)
+SELECT indexdef FROM pg_indexes
+WHERE schemaname = current_schema() AND tablename = 'painting' AND indexname <> 'painting_pkey'
+ORDER BY indexname;
+
+INSERT INTO painting_dependent (definition)
+SELECT pg_get_triggerdef(oid) FROM pg_trigger
+WHERE tgrelid = 'painting'::regclass AND NOT tgisinternal
+ORDER BY tgname;
+
+CREATE TEMPORARY TABLE view_dependent (
+    ordinal SERIAL,
+    definition TEXT NOT NULL
+) ON COMMIT DROP;
+
+INSERT INTO view_dependent (definition)
+SELECT 'CREATE MATERIALIZED VIEW painting_denormalized AS ' || pg_get_viewdef('painting_denormalized'::regclass);
+
+INSERT INTO view_dependent (definition)
+SELECT indexdef FROM pg_indexes
+WHERE schemaname = current_schema() AND tablename = 'painting_denormalized'
+ORDER BY indexname;
+
+DROP MATERIALIZED VIEW painting_denormalized;
+
+-- Move the old table out of the way; its sequence is handed over to the new one
+ALTER TABLE painted DROP CONSTRAINT fk_painted_painting;
+ALTER TABLE visitable DROP CONSTRAINT fk_visitable_painting;
+ALTER SEQUENCE painting_serial_number_seq OWNED BY NONE;
+ALTER TABLE painting RENAME TO painting_unpartitioned;
+ALTER TABLE painting_unpartitioned RENAME CONSTRAINT painting_pkey TO painting_unpartitioned_pkey;
+DO $$
+DECLARE
+    index_name TEXT;
+BEGIN
+    FOR index_name IN
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = 'painting_unpartitioned'
+          AND indexname <> 'painting_unpartitioned_pkey'
+    LOOP
+        EXECUTE format('DROP INDEX %I', index_name);
+    END LOOP;
+END;
+$$;
+
+CREATE TABLE painting (
+    serial_number INTEGER NOT NULL DEFAULT nextval('painting_serial_number_seq'),
+    title VARCHAR(200) NOT NULL,
+    style_type VARCHAR(50) NOT NULL,
+    year_created INTEGER,
+    wikipedia_url VARCHAR(500),
+    search_vector TSVECTOR,
+    PRIMARY KEY (serial_number, style_type),
+    CONSTRAINT check_title CHECK (LENGTH(title) > 0),
+    CONSTRAINT check_style CHECK (LENGTH(style_type) > 0),
+    CONSTRAINT check_year_created CHECK (year_created IS NULL OR (year_created > 1000 AND year_created <= EXTRACT(YEAR FROM CURRENT_DATE)))
+) PARTITION BY LIST (style_type);
+
+DO $$
+DECLARE
+    style TEXT;
+BEGIN
+    FOREACH style IN ARRAY ARRAY[
+        'Renaissance', 'Baroque', 'Rococo', 'Neoclassicism', 'Romanticism', 'Realism',
+        'Impressionism', 'Post-Impressionism', 'Expressionism', 'Cubism', 'Futurism',
+        'Surrealism', 'Abstract Expressionism', 'Pop Art', 'Minimalism', 'Contemporary'
+    ] LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF painting FOR VALUES IN (%L)',
+                       'painting_' || lower(regexp_replace(style, '\W+', '_', 'g')), style);
+    END LOOP;
+END;
+$$;
+CREATE TABLE painting_other_style PARTITION OF painting DEFAULT;
+
+ALTER SEQUENCE painting_serial_number_seq OWNED BY painting.serial_number;
+
+-- Copy the rows before the triggers exist, so the statistics are not counted twice
+INSERT INTO painting (serial_number, title, style_type, year_created, wikipedia_url, search_vector)
+SELECT serial_number, title, style_type, year_created, wikipedia_url, search_vector FROM painting_unpartitioned;
+
+DROP TABLE painting_unpartitioned;
+
+DO $$
+DECLARE
+    definition TEXT;
+BEGIN
+    FOR definition IN SELECT d.definition FROM painting_dependent d ORDER BY ordinal LOOP
+        EXECUTE definition;
+    END LOOP;
+END;
+$$;
+
+-- ==========================================
+-- SERIAL NUMBER REGISTRY: every serial_number with its style. Its primary key rejects
+-- a serial_number already used in another partition, which painting's key no longer
+-- does, and it finds the style of a painting with one index lookup instead of one per
+-- partition. Statement-level triggers keep it in step with painting.
+-- ==========================================
+CREATE TABLE painting_serial (
+    serial_number INTEGER PRIMARY KEY,
+    style_type VARCHAR(50) NOT NULL
+);
+
+INSERT INTO painting_serial (serial_number, style_type)
+SELECT serial_number, style_type FROM painting;
+
+CREATE OR REPLACE FUNCTION painting_serial_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO painting_serial (serial_number, style_type)
+        SELECT serial_number, style_type FROM new_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Only rows whose serial_number or style changed
+        DELETE FROM painting_serial
+        WHERE (serial_number, style_type) IN (SELECT serial_number, style_type FROM old_rows
+                                              EXCEPT SELECT serial_number, style_type FROM new_rows);
+        INSERT INTO painting_serial (serial_number, style_type)
+        SELECT serial_number, style_type FROM new_rows
+        EXCEPT SELECT serial_number, style_type FROM old_rows;
+    ELSE
+        DELETE FROM painting_serial WHERE serial_number IN (SELECT serial_number FROM old_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_painting_serial_insert
+    AFTER INSERT ON painting REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painting_serial_update();
+CREATE TRIGGER trg_painting_serial_update
+    AFTER UPDATE ON painting REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painting_serial_update();
+CREATE TRIGGER trg_painting_serial_delete
+    AFTER DELETE ON painting REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION painting_serial_update();
+
+-- ==========================================
+-- RELATIONSHIP TABLES: foreign keys on (serial_number, style_type). A style change
+-- cascades to them, and deleting a painting still deletes its links.
+-- ==========================================
+ALTER TABLE painted ADD COLUMN painting_style_type VARCHAR(50);
+ALTER TABLE visitable ADD COLUMN painting_style_type VARCHAR(50);
+
+UPDATE painted pt SET painting_style_type = p.style_type
+FROM painting_serial p WHERE p.serial_number = pt.painting_serial_number;
+UPDATE visitable v SET painting_style_type = p.style_type
+FROM painting_serial p WHERE p.serial_number = v.painting_serial_number;
+
+ALTER TABLE painted ALTER COLUMN painting_style_type SET NOT NULL;
+ALTER TABLE visitable ALTER COLUMN painting_style_type SET NOT NULL;
+
+ALTER TABLE painted ADD CONSTRAINT fk_painted_painting
+    FOREIGN KEY (painting_serial_number, painting_style_type) REFERENCES painting (serial_number, style_type)
+    ON UPDATE CASCADE ON DELETE CASCADE;
+ALTER TABLE visitable ADD CONSTRAINT fk_visitable_painting
+    FOREIGN KEY (painting_serial_number, painting_style_type) REFERENCES painting (serial_number, style_type)
+    ON UPDATE CASCADE ON DELETE CASCADE;
+
+CREATE OR REPLACE FUNCTION painting_style_type_fill()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.painting_style_type IS NULL THEN
+        SELECT style_type INTO NEW.painting_style_type
+        FROM painting_serial WHERE serial_number = NEW.painting_serial_number;
+        -- Paintings inserted by the same statement (e.g. in a WITH clause) are only
+        -- registered at its end
+        IF NOT FOUND THEN
+            SELECT style_type INTO NEW.painting_style_type
+            FROM painting WHERE serial_number = NEW.painting_serial_number;
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_painted_style_type ON painted;
+CREATE TRIGGER trg_painted_style_type
+    BEFORE INSERT ON painted
+    FOR EACH ROW EXECUTE FUNCTION painting_style_type_fill();
+DROP TRIGGER IF EXISTS trg_visitable_style_type ON visitable;
+CREATE TRIGGER trg_visitable_style_type
+    BEFORE INSERT ON visitable
+    FOR EACH ROW EXECUTE FUNCTION painting_style_type_fill();
+
+-- Covering indexes: joins from painting reach the artist or city through an index-only scan
+DROP INDEX IF EXISTS idx_painted_painting_serial_number;
+CREATE INDEX idx_painted_painting_serial_number ON painted (painting_serial_number) INCLUDE (artist_id);
+DROP INDEX IF EXISTS idx_visitable_painting_serial_number;
+CREATE INDEX idx_visitable_painting_serial_number
+    ON visitable (painting_serial_number) INCLUDE (city_country_iso, city_zipcode);
+
+-- ==========================================
+-- REPORTING VIEW: re-created as it was, on the partitioned table
+-- ==========================================
+DO $$
+DECLARE
+    definition TEXT;
+BEGIN
+    FOR definition IN SELECT d.definition FROM view_dependent d ORDER BY ordinal LOOP
+        EXECUTE definition;
+    END LOOP;
+END;
+$$;
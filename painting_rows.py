@@ -0,0 +1,37 @@
+import pandas as pd
+
+
+def validate_painting_rows(df, artist_options, city_options):
+    """Check the rows of the multi-painting grid against the loaded artist and city lists.
+
+    Rows left completely empty are ignored. Returns (paintings, errors) where paintings
+    is ready for insert_paintings and errors lists problems by row number.
+    """
+    paintings = []
+    errors = []
+    for number, row in enumerate(df.to_dict("records"), start=1):
+        values = {key: (None if pd.isna(value) or value == "" else value) for key, value in row.items()}
+        if all(value is None for value in values.values()):
+            continue
+        missing = [label for key, label in [("title", "title"), ("style_type", "style"),
+                                            ("artist", "artist"), ("city", "city")] if values[key] is None]
+        if missing:
+            errors.append(f"Row {number}: missing {', '.join(missing)}")
+            continue
+        if values["artist"] not in artist_options:
+            errors.append(f"Row {number}: unknown artist '{values['artist']}'")
+            continue
+        if values["city"] not in city_options:
+            errors.append(f"Row {number}: unknown city '{values['city']}'")
+            continue
+        city_country_iso, city_zipcode = city_options[values["city"]]
+        paintings.append({
+            "title": values["title"],
+            "style_type": values["style_type"],
+            "year_created": None if values["year_created"] is None else int(values["year_created"]),
+            "wikipedia_url": values["wikipedia_url"],
+            "artist_id": int(artist_options[values["artist"]]),
+            "city_country_iso": city_country_iso,
+            "city_zipcode": city_zipcode,
+        })
+    return paintings, errors
@@ -0,0 +1,222 @@
+import json
+import queue
+import random
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+# Defaults, overridable in .streamlit/secrets.toml under [profiling]
+DEFAULT_LOG_PATH = "query_log.sqlite"
+DEFAULT_SLOW_MS = 200
+DEFAULT_EXPLAIN_RATE = 0.2
+# The log keeps roughly this many of the most recent queries
+MAX_LOG_ROWS = 100000
+# Most log writes the background writer commits at once
+WRITE_BATCH_SIZE = 500
+
+# Statements that must not be run by EXPLAIN ANALYZE (it executes them)
+DATA_MODIFYING = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+LOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_log (
+    id INTEGER PRIMARY KEY,
+    logged_at REAL NOT NULL,
+    name TEXT NOT NULL,
+    statement TEXT NOT NULL,
+    params_shape TEXT NOT NULL,
+    rows INTEGER,
+    elapsed_ms REAL NOT NULL,
+    plan TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_query_log_elapsed ON query_log (elapsed_ms DESC);
+"""
+
+
+def params_shape(params):
+    """Describe bound parameters by type (and length for lists) without their values."""
+    shape = {}
+    for key, value in sorted((params or {}).items()):
+        if isinstance(value, (list, tuple)):
+            shape[key] = f"{type(value).__name__}[{len(value)}]"
+        else:
+            shape[key] = type(value).__name__
+    return json.dumps(shape)
+
+
+def explain(engine, statement, params):
+    """Return the text plan of a statement: EXPLAIN (ANALYZE, BUFFERS) for reads, EXPLAIN for writes."""
+    statement = statement.strip().rstrip(";")
+    if statement.upper().startswith("CALL"):
+        return None
+    options = "" if DATA_MODIFYING.search(statement) else "(ANALYZE, BUFFERS) "
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"EXPLAIN {options}{statement}"), params or {}).scalars().all()
+    return "\n".join(rows)
+
+
+class QueryProfiler:
+    """Logs every profiled query to a local SQLite file and samples plans of slow ones.
+
+    Each entry holds the query name, the shape of its parameters, the row count and the
+    wall time. For queries slower than slow_ms, a share (explain_rate) is re-run under
+    EXPLAIN in a background thread and the plan is stored with the entry.
+
+    record() only queues the entry: a single writer thread inserts whatever has queued
+    up in one transaction, so queries never wait for SQLite. The file is in WAL mode.
+    """
+
+    def __init__(self, path=DEFAULT_LOG_PATH, slow_ms=DEFAULT_SLOW_MS, explain_rate=DEFAULT_EXPLAIN_RATE):
+        self.slow_ms = slow_ms
+        self.explain_rate = explain_rate
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(LOG_SCHEMA)
+        self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+        self._inserts = 0
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="query-log", daemon=True)
+        self._writer.start()
+
+    def record(self, name, statement, params, rows, elapsed_ms, engine=None):
+        sample = engine is not None and elapsed_ms >= self.slow_ms and random.random() < self.explain_rate
+        entry = (time.time(), name, statement, params_shape(params), rows, elapsed_ms)
+        self._queue.put(("entry", entry, (engine, statement, params) if sample else None))
+
+    def flush(self):
+        """Wait until everything recorded so far is written."""
+        self._queue.join()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except sqlite3.Error:
+                pass  # losing log entries must never break the app
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        explains = []
+        with self._lock:
+            for kind, values, sample in batch:
+                if kind == "plan":
+                    self._db.execute("UPDATE query_log SET plan = ? WHERE id = ?", values)
+                    continue
+                cursor = self._db.execute(
+                    "INSERT INTO query_log (logged_at, name, statement, params_shape, rows, elapsed_ms) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", values)
+                self._inserts += 1
+                if self._inserts % 1000 == 0:
+                    self._db.execute("DELETE FROM query_log WHERE id <= ?", (cursor.lastrowid - MAX_LOG_ROWS,))
+                if sample:
+                    explains.append((cursor.lastrowid,) + sample)
+            self._db.commit()
+        for entry_id, engine, statement, params in explains:
+            self._explainer.submit(self._store_plan, entry_id, engine, statement, params)
+
+    def _store_plan(self, entry_id, engine, statement, params):
+        try:
+            plan = explain(engine, statement, params)
+        except Exception as e:
+            plan = f"EXPLAIN failed: {e}"
+        if plan is None:
+            return
+        self._queue.put(("plan", (plan, entry_id), None))
+
+    def _fetch(self, sql, args=()):
+        with self._lock:
+            cursor = self._db.execute(sql, args)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def summary(self):
+        """Per query name: calls, average/maximum/total time and number of slow calls."""
+        return self._fetch("""
+            SELECT name, COUNT(*) AS calls, AVG(elapsed_ms) AS avg_ms, MAX(elapsed_ms) AS max_ms,
+                   SUM(elapsed_ms) AS total_ms, SUM(elapsed_ms >= ?) AS slow_calls
+            FROM query_log GROUP BY name ORDER BY max_ms DESC
+        """, (self.slow_ms,))
+
+    def slowest(self, limit=20):
+        """The slowest logged queries, with their plans where one was sampled."""
+        return self._fetch("""
+            SELECT id, datetime(logged_at, 'unixepoch') AS logged_at, name, statement, params_shape,
+                   rows, elapsed_ms, plan
+            FROM query_log ORDER BY elapsed_ms DESC LIMIT ?
+        """, (limit,))
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM query_log")
+            self._db.commit()
+
+
+class ProfiledSession:
+    """Session wrapper whose execute() is timed and logged."""
+
+    def __init__(self, session, connection):
+        self._session = session
+        self._connection = connection
+
+    def __enter__(self):
+        self._session.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._session.__exit__(*exc_info)
+
+    def __getattr__(self, attribute):
+        return getattr(self._session, attribute)
+
+    def execute(self, statement, params=None, *, name=None, **kwargs):
+        started = time.perf_counter()
+        result = self._session.execute(statement, params, **kwargs)
+        self._connection.record(name, str(statement), params, result.rowcount,
+                                (time.perf_counter() - started) * 1000)
+        return result
+
+
+class ProfiledConnection:
+    """Wraps st.connection's SQLConnection so that query() and session.execute() are profiled.
+
+    Queries are logged under the given name, else under the name registered for their
+    SQL text (names), else under their first words. Everything else is delegated.
+    """
+
+    def __init__(self, connection, profiler, names=None):
+        self._connection = connection
+        self._profiler = profiler
+        self._names = names or {}
+
+    def __getattr__(self, attribute):
+        return getattr(self._connection, attribute)
+
+    def query_name(self, statement):
+        return self._names.get(statement) or " ".join(statement.split()[:4])
+
+    def record(self, name, statement, params, rows, elapsed_ms):
+        self._profiler.record(name or self.query_name(statement), statement, params, rows, elapsed_ms,
+                              self._connection.engine)
+
+    def query(self, sql, *, name=None, params=None, **kwargs):
+        started = time.perf_counter()
+        df = self._connection.query(sql, params=params, **kwargs)
+        self.record(name, sql, params, len(df), (time.perf_counter() - started) * 1000)
+        return df
+
+    @property
+    def session(self):
+        return ProfiledSession(self._connection.session, self)
@@ -0,0 +1,252 @@
+"""SQL issued by the View Data, Statistics, Analytics and Add pages and the dropdown lookups.
+
+Kept in one place so the app and the benchmark suite (benchmarks/query_benchmark.py)
+always run exactly the same statements. The app runs the SELECTs as server-side
+prepared statements (db.run_prepared); each constant's lowercased name is the name
+of its prepared statement and of its entries in the slow-query log.
+"""
+
+# Lookup lists used by the dropdowns
+LOOKUP_QUERIES = {
+    "countries": "SELECT iso, country_name FROM country ORDER BY country_name;",
+    "cities": "SELECT country_iso, zipcode, name FROM city ORDER BY name;",
+    "artists": "SELECT id, first_name, last_name FROM artist ORDER BY last_name, first_name;",
+    "styles": "SELECT DISTINCT style_type FROM painting ORDER BY style_type;",
+}
+
+# Table each lookup list is read from, for invalidation by change notifications
+LOOKUP_TABLES = {
+    "countries": "country",
+    "cities": "city",
+    "artists": "artist",
+    "styles": "painting",
+}
+
+# Counts the rows PAINTINGS_PAGE pages over: one per (painting, artist, city)
+PAINTINGS_COUNT = "SELECT count(*) AS total FROM painting_denormalized;"
+
+# Unique key of painting_denormalized, the keyset PAINTINGS_PAGE pages on, and
+# the key that sorts before every row (the start of the first page)
+PAINTINGS_PAGE_KEY = ("serial_number", "artist_id", "city_country_iso", "city_zipcode")
+PAINTINGS_FIRST_KEY = (0, 0, "", "")
+
+# Keyset pagination on the view's unique index; callers ask for one row more than a page
+PAINTINGS_PAGE = """
+    SELECT
+        serial_number,
+        title,
+        style_type,
+        year_created,
+        artist_name,
+        city_name,
+        country_name,
+        wikipedia_url,
+        artist_id,
+        city_country_iso,
+        city_zipcode
+    FROM painting_denormalized
+    WHERE (serial_number, artist_id, city_country_iso, city_zipcode)
+        > (:after_serial, :after_artist, :after_iso, :after_zip)
+    ORDER BY serial_number, artist_id, city_country_iso, city_zipcode
+    LIMIT :limit;
+"""
+
+# Painting counts come from the trigger-maintained statistics tables (migration 003)
+ALL_ARTISTS = """
+    SELECT
+        a.id,
+        a.first_name,
+        a.last_name,
+        a.birth_year,
+        a.death_year,
+        COALESCE(s.paintings, 0) AS number_of_paintings
+    FROM artist a
+    LEFT JOIN artist_stat s ON s.artist_id = a.id
+    ORDER BY a.last_name, a.first_name;
+"""
+
+ALL_CITIES = """
+    SELECT
+        c.country_iso,
+        c.zipcode,
+        c.name,
+        co.country_name,
+        COALESCE(s.paintings, 0) AS paintings_count
+    FROM city c
+    JOIN country co ON c.country_iso = co.iso
+    LEFT JOIN city_stat s ON s.country_iso = c.country_iso AND s.zipcode = c.zipcode
+    ORDER BY paintings_count DESC, c.name;
+"""
+
+PAINTINGS_BY_CITY = """
+    SELECT
+        p.title,
+        p.style_type,
+        p.year_created,
+        a.first_name || ' ' || a.last_name AS artist_name
+    FROM painting p
+    JOIN visitable v ON p.serial_number = v.painting_serial_number
+    JOIN painted pt ON p.serial_number = pt.painting_serial_number
+    JOIN artist a ON pt.artist_id = a.id
+    WHERE v.city_country_iso = :country_iso AND v.city_zipcode = :zipcode
+    ORDER BY p.year_created;
+"""
+
+PAINTINGS_BY_ARTIST = """
+    SELECT
+        p.title,
+        p.style_type,
+        p.year_created,
+        c.name AS city_name,
+        co.country_name
+    FROM painting p
+    JOIN painted pt ON p.serial_number = pt.painting_serial_number
+    JOIN visitable v ON p.serial_number = v.painting_serial_number
+    JOIN city c ON v.city_country_iso = c.country_iso AND v.city_zipcode = c.zipcode
+    JOIN country co ON c.country_iso = co.iso
+    WHERE pt.artist_id = :artist_id
+    ORDER BY p.year_created;
+"""
+
+PAINTINGS_BY_STYLE = """
+    SELECT
+        title,
+        year_created,
+        artist_name,
+        city_name
+    FROM painting_denormalized
+    WHERE style_type = :style
+    ORDER BY year_created;
+"""
+
+# Statistics dashboard: reads only the small statistics tables
+STATISTICS_TOTALS = """
+    SELECT
+        (SELECT COALESCE(SUM(paintings), 0) FROM style_stat) AS paintings,
+        (SELECT COUNT(*) FROM artist_stat) AS artists,
+        (SELECT COUNT(*) FROM city_stat) AS cities,
+        (SELECT COUNT(*) FROM country_stat) AS countries;
+"""
+
+PAINTINGS_PER_STYLE = "SELECT style_type, paintings FROM style_stat ORDER BY paintings DESC, style_type;"
+
+PAINTINGS_PER_DECADE = "SELECT decade, paintings FROM decade_stat WHERE decade >= 0 ORDER BY decade;"
+
+PAINTINGS_PER_COUNTRY = """
+    SELECT co.country_name, s.paintings
+    FROM country_stat s
+    JOIN country co ON co.iso = s.country_iso
+    ORDER BY s.paintings DESC, co.country_name;
+"""
+
+TOP_ARTISTS = """
+    SELECT a.first_name || ' ' || a.last_name AS artist_name, s.paintings
+    FROM artist_stat s
+    JOIN artist a ON a.id = s.artist_id
+    ORDER BY s.paintings DESC, s.artist_id
+    LIMIT :limit;
+"""
+
+TOP_CITIES = """
+    SELECT c.name AS city_name, c.zipcode, s.paintings
+    FROM city_stat s
+    JOIN city c ON c.country_iso = s.country_iso AND c.zipcode = s.zipcode
+    ORDER BY s.paintings DESC, c.name
+    LIMIT :limit;
+"""
+
+# Analytics page: reads only the rollup tables of migrations/005_analytics.sql.
+# Paintings without a year (decade -1) are left out of the time series.
+COUNTRY_DECADES = """
+    SELECT co.country_name, s.decade, s.paintings
+    FROM (SELECT country_iso FROM country_stat ORDER BY paintings DESC, country_iso LIMIT :limit) top
+    JOIN country_decade_stat s ON s.country_iso = top.country_iso
+    JOIN country co ON co.iso = s.country_iso
+    WHERE s.decade >= 0
+    ORDER BY s.decade, co.country_name;
+"""
+
+CITY_DECADES = """
+    SELECT c.name AS city_name, c.country_iso, c.zipcode, s.decade, s.paintings
+    FROM (SELECT country_iso, zipcode FROM city_stat
+          ORDER BY paintings DESC, country_iso, zipcode LIMIT :limit) top
+    JOIN city_decade_stat s ON s.country_iso = top.country_iso AND s.zipcode = top.zipcode
+    JOIN city c ON c.country_iso = s.country_iso AND c.zipcode = s.zipcode
+    WHERE s.decade >= 0
+    ORDER BY s.decade, c.name;
+"""
+
+STYLE_DECADES = """
+    SELECT style_type, decade, paintings FROM style_decade_stat
+    WHERE decade >= 0
+    ORDER BY decade, style_type;
+"""
+
+# Active artists in a decade: born in or before it, minus those who died before it
+ARTIST_DECADES = """
+    SELECT d.decade, coalesce(s.born, 0) AS born, coalesce(s.died, 0) AS died,
+           (sum(coalesce(s.born, 0)) OVER w - sum(coalesce(s.died, 0)) OVER w + coalesce(s.died, 0))::bigint AS active
+    FROM generate_series((SELECT min(decade) FROM artist_decade_stat),
+                         (SELECT max(decade) FROM artist_decade_stat), 10) AS d(decade)
+    LEFT JOIN artist_decade_stat s ON s.decade = d.decade
+    WINDOW w AS (ORDER BY d.decade)
+    ORDER BY d.decade;
+"""
+
+# Tables each cached query depends on, for invalidation by change notifications.
+# The statistics tables count as the table whose triggers maintain them, and the
+# reporting view announces its own refresh as painting_denormalized.
+QUERY_TABLES = {
+    PAINTINGS_COUNT: ("painting_denormalized",),
+    PAINTINGS_PAGE: ("painting_denormalized",),
+    ALL_ARTISTS: ("artist", "painted"),
+    ALL_CITIES: ("city", "country", "visitable"),
+    PAINTINGS_BY_CITY: ("painting", "painted", "visitable", "artist"),
+    PAINTINGS_BY_ARTIST: ("painting", "painted", "visitable", "city", "country"),
+    PAINTINGS_BY_STYLE: ("painting_denormalized",),
+    STATISTICS_TOTALS: ("painting", "painted", "visitable"),
+    PAINTINGS_PER_STYLE: ("painting",),
+    PAINTINGS_PER_DECADE: ("painting",),
+    PAINTINGS_PER_COUNTRY: ("visitable", "country"),
+    TOP_ARTISTS: ("painted", "artist"),
+    TOP_CITIES: ("visitable", "city"),
+    COUNTRY_DECADES: ("visitable", "painting", "country"),
+    CITY_DECADES: ("visitable", "painting", "city"),
+    STYLE_DECADES: ("painting",),
+    ARTIST_DECADES: ("artist",),
+}
+
+# Add Artist; :dy is NULL for living artists
+INSERT_ARTIST = """
+    INSERT INTO artist (first_name, last_name, birth_year, death_year)
+    VALUES (:fn, :ln, :by, :dy);
+"""
+
+# Add City
+INSERT_CITY = """
+    INSERT INTO city (country_iso, zipcode, name)
+    VALUES (:ci, :zc, :n);
+"""
+
+# Add Painting: any number of paintings with their painted/visitable links in one
+# statement. Serial numbers are drawn up front so every row keeps its own links.
+INSERT_PAINTINGS = """
+    WITH new_rows AS MATERIALIZED (
+        SELECT nextval(pg_get_serial_sequence('painting', 'serial_number'))::int AS serial_number, r.*
+        FROM unnest(CAST(:titles AS TEXT[]), CAST(:styles AS TEXT[]), CAST(:years AS INTEGER[]),
+                    CAST(:urls AS TEXT[]), CAST(:artist_ids AS INTEGER[]),
+                    CAST(:city_isos AS CHAR(2)[]), CAST(:city_zipcodes AS TEXT[]))
+            AS r(title, style_type, year_created, wikipedia_url, artist_id, city_country_iso, city_zipcode)
+    ), paintings AS (
+        INSERT INTO painting (serial_number, title, style_type, year_created, wikipedia_url)
+        SELECT serial_number, title, style_type, year_created, wikipedia_url FROM new_rows
+        RETURNING serial_number
+    ), painted_links AS (
+        INSERT INTO painted (artist_id, painting_serial_number)
+        SELECT artist_id, serial_number FROM new_rows
+    ), visitable_links AS (
+        INSERT INTO visitable (city_country_iso, city_zipcode, painting_serial_number)
+        SELECT city_country_iso, city_zipcode, serial_number FROM new_rows
+    )
+    SELECT serial_number FROM paintings ORDER BY serial_number;
+"""
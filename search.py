@@ -0,0 +1,230 @@
+import re
+
+# Close spellings (from the title vocabulary) added to each word of a quick search
+SPELLING_ALTERNATIVES = 3
+# Best matching artists whose paintings are considered by the quick search
+ARTIST_CANDIDATES = 10
+
+def _filter_predicates(country_isos=None, city_keys=None, artist_ids=None, styles=None):
+    """Build one SQL predicate per Advanced Search facet.
+
+    Filters are applied to key columns of painting_denormalized (country ISO code,
+    (country_iso, zipcode) city key, artist id) so the planner can use the indexes.
+    Facets without a selection get no predicate. Returns (predicates, params).
+    """
+    predicates = {}
+    params = {}
+
+    if country_isos:
+        predicates['country'] = "country_iso = ANY(CAST(:country_isos AS CHAR(2)[]))"
+        params['country_isos'] = list(country_isos)
+
+    if city_keys:
+        predicates['city'] = """(city_country_iso, city_zipcode) IN (
+            SELECT * FROM unnest(CAST(:city_isos AS CHAR(2)[]), CAST(:city_zipcodes AS VARCHAR(10)[])))"""
+        params['city_isos'] = [iso for iso, _ in city_keys]
+        params['city_zipcodes'] = [zipcode for _, zipcode in city_keys]
+
+    if artist_ids:
+        predicates['artist'] = "artist_id = ANY(CAST(:artist_ids AS INTEGER[]))"
+        params['artist_ids'] = [int(artist_id) for artist_id in artist_ids]
+
+    if styles:
+        predicates['style'] = "style_type = ANY(:styles)"
+        params['styles'] = list(styles)
+
+    return predicates, params
+
+
+def build_search_query(country_isos=None, city_keys=None, artist_ids=None, styles=None,
+                       limit=None, offset=0):
+    """Build the Advanced Search query and its parameters.
+
+    city_keys is a list of (country_iso, zipcode) tuples. With limit given, only that
+    page of the (totally ordered) result is returned. Returns (query, params).
+    """
+    predicates, params = _filter_predicates(country_isos, city_keys, artist_ids, styles)
+
+    query = """
+        SELECT
+            serial_number,
+            title,
+            style_type,
+            year_created,
+            artist_name,
+            city_name,
+            country_name,
+            wikipedia_url
+        FROM painting_denormalized
+        WHERE 1=1
+    """
+
+    # Add filters dynamically
+    for predicate in predicates.values():
+        query += f" AND {predicate}"
+
+    # The trailing key columns make the order total, so pages never overlap
+    query += " ORDER BY year_created, title, serial_number, artist_id, city_country_iso, city_zipcode"
+    if limit is not None:
+        query += " LIMIT :limit OFFSET :offset"
+        params['limit'] = limit
+        params['offset'] = offset
+    return query + ";", params
+
+
+def build_facet_query(country_isos=None, city_keys=None, artist_ids=None, styles=None):
+    """Build a single GROUPING SETS query returning the remaining options of every facet.
+
+    Each facet value is counted against all *other* selected filters, so a facet keeps
+    offering alternatives to its own selection. One row per (facet, value) with a
+    positive count, plus a row with facet 'total' holding the size of the current result.
+    Returns (query, params).
+    """
+    predicates, params = _filter_predicates(country_isos, city_keys, artist_ids, styles)
+    matches = {facet: predicates.get(facet, "TRUE") for facet in ('country', 'city', 'artist', 'style')}
+
+    query = f"""
+        WITH matches AS (
+            SELECT
+                country_iso, country_name,
+                city_country_iso, city_zipcode, city_name,
+                artist_id, artist_name,
+                style_type,
+                ({matches['country']}) AS in_country,
+                ({matches['city']}) AS in_city,
+                ({matches['artist']}) AS in_artist,
+                ({matches['style']}) AS in_style
+            FROM painting_denormalized
+        ), facets AS (
+            SELECT
+                GROUPING(country_iso, city_zipcode, artist_id, style_type) AS grouping_id,
+                country_iso, country_name,
+                city_country_iso, city_zipcode, city_name,
+                artist_id, artist_name,
+                style_type,
+                COUNT(*) FILTER (WHERE in_city AND in_artist AND in_style) AS country_count,
+                COUNT(*) FILTER (WHERE in_country AND in_artist AND in_style) AS city_count,
+                COUNT(*) FILTER (WHERE in_country AND in_city AND in_style) AS artist_count,
+                COUNT(*) FILTER (WHERE in_country AND in_city AND in_artist) AS style_count,
+                COUNT(*) FILTER (WHERE in_country AND in_city AND in_artist AND in_style) AS total_count
+            FROM matches
+            -- Rows failing two or more filters cannot count towards any facet
+            WHERE in_country::int + in_city::int + in_artist::int + in_style::int >= 3
+            GROUP BY GROUPING SETS (
+                (country_iso, country_name),
+                (city_country_iso, city_zipcode, city_name),
+                (artist_id, artist_name),
+                (style_type),
+                ()
+            )
+        )
+        SELECT facet, country_iso, country_name, city_country_iso, city_zipcode, city_name,
+               artist_id, artist_name, style_type, paintings
+        FROM (
+            SELECT
+                CASE grouping_id WHEN 7 THEN 'country' WHEN 11 THEN 'city'
+                                 WHEN 13 THEN 'artist' WHEN 14 THEN 'style' ELSE 'total' END AS facet,
+                country_iso, country_name, city_country_iso, city_zipcode, city_name,
+                artist_id, artist_name, style_type,
+                CASE grouping_id WHEN 7 THEN country_count WHEN 11 THEN city_count
+                                 WHEN 13 THEN artist_count WHEN 14 THEN style_count ELSE total_count END AS paintings
+            FROM facets
+        ) AS f
+        WHERE paintings > 0 OR facet = 'total'
+        ORDER BY facet, country_name, city_name, artist_name, style_type;
+    """
+    return query, params
+
+
+def build_text_search_query(term, limit=25, offset=0, candidates=500):
+    """Build the ranked title/artist search used by the quick search box.
+
+    Every word of the term is matched against the search_vector full-text index (the
+    last one, still being typed, as a prefix), together with up to SPELLING_ALTERNATIVES
+    close spellings found by pg_trgm in the search_word vocabulary (so typos still match).
+    Artist names are fuzzy-matched with pg_trgm word similarity. To keep typeahead
+    latency flat on large catalogs, only the `candidates` matching titles with the
+    highest full-text rank (ts_rank, much cheaper than the title similarity) and
+    paintings of the best matching artists are scored; the page returned is cut from
+    those by relevance. Returns (query, params).
+    """
+    words = re.findall(r"[^\W_]+", term.lower())
+    if words and len(words[-1]) == 1:
+        # A single trailing character as a prefix would expand to a large part of the index
+        words = words[:-1]
+    params = {
+        'term': term.strip(),
+        'words': words,
+        'prefix_position': len(words),
+        'limit': limit,
+        'offset': offset,
+        'candidates': max(candidates, offset + limit),
+        'alternatives': SPELLING_ALTERNATIVES,
+        'artist_candidates': ARTIST_CANDIDATES,
+    }
+
+    query = """
+        WITH query_words AS (
+            SELECT word, position
+            FROM unnest(CAST(:words AS TEXT[])) WITH ORDINALITY AS w(word, position)
+        ), spellings AS (
+            -- (word | closest vocabulary words) for each word of the term, word:* for the last one
+            SELECT q.position,
+                   '(' || quote_literal(q.word) || CASE WHEN q.position = :prefix_position THEN ':*' ELSE '' END
+                       || coalesce(' | ' || string_agg(quote_literal(s.word), ' | '), '') || ')' AS alternatives
+            FROM query_words q
+            LEFT JOIN LATERAL (
+                SELECT sw.word
+                FROM search_word sw
+                WHERE length(q.word) >= 3 AND sw.word % q.word AND sw.word <> q.word
+                ORDER BY similarity(sw.word, q.word) DESC, sw.word
+                LIMIT :alternatives
+            ) s ON TRUE
+            GROUP BY q.position, q.word
+        ), search_query AS (
+            SELECT to_tsquery('simple', string_agg(alternatives, ' & ' ORDER BY position)) AS tsq
+            FROM spellings
+        ), title_matches AS (
+            SELECT p.serial_number, p.title, ts_rank(p.search_vector, sq.tsq) AS rank
+            FROM search_query sq
+            JOIN painting p ON p.search_vector @@ sq.tsq
+            ORDER BY rank DESC, p.serial_number
+            LIMIT :candidates
+        ), artist_matches AS (
+            SELECT a.id, word_similarity(:term, a.first_name || ' ' || a.last_name) AS score
+            FROM artist a
+            WHERE :term <% (a.first_name || ' ' || a.last_name)
+            ORDER BY score DESC, a.id
+            LIMIT :artist_candidates
+        ), artist_paintings AS (
+            SELECT pt.painting_serial_number AS serial_number, am.score
+            FROM artist_matches am
+            JOIN painted pt ON pt.artist_id = am.id
+            ORDER BY am.score DESC, pt.painting_serial_number
+            LIMIT :candidates
+        ), ranked AS (
+            SELECT serial_number, MAX(score) AS relevance
+            FROM (
+                SELECT serial_number, rank + word_similarity(:term, title) AS score FROM title_matches
+                UNION ALL
+                SELECT serial_number, score FROM artist_paintings
+            ) AS scored
+            GROUP BY serial_number
+            ORDER BY relevance DESC, serial_number
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT
+            d.serial_number,
+            d.title,
+            d.style_type,
+            d.year_created,
+            d.artist_name,
+            d.city_name,
+            d.country_name,
+            d.wikipedia_url,
+            r.relevance
+        FROM ranked r
+        JOIN painting_denormalized d ON d.serial_number = r.serial_number
+        ORDER BY r.relevance DESC, d.serial_number;
+    """
+    return query, params
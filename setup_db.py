@@ -1,11 +1,117 @@
+import argparse
+import hashlib
 import psycopg2
 import toml
 import os
+import re
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2 import sql
 
 # Configuration
 SECRETS_FILE = ".streamlit/secrets.toml"
-FILES_TO_EXECUTE = ["create_tables.sql", "sample_data.sql"]
+SCHEMA_FILE = "create_tables.sql"
+SAMPLE_DATA_FILE = "sample_data.sql"
+MIGRATIONS = [
+    "migrations/001_indexes_and_reporting_view.sql",
+    "migrations/002_text_search.sql",
+    "migrations/003_statistics.sql",
+    "migrations/004_change_notifications.sql",
+    "migrations/005_analytics.sql",
+]
+# Optional schema mode (--partitioned), applied after MIGRATIONS
+PARTITIONED_MIGRATION = "migrations/partitioned_painting.sql"
+# Older servers run a cross-partition UPDATE as DELETE plus INSERT, which fires the
+# ON DELETE CASCADE of painted and visitable instead of their ON UPDATE CASCADE
+PARTITIONED_MIN_SERVER_VERSION = 150000
+# Tables filled by the data load; their foreign keys are dropped while loading
+DATA_TABLES = ["country", "city", "artist", "painting", "painted", "visitable"]
+DEFAULT_JOBS = 4
+
+# Applied files (and loaded tables) are recorded here, so reruns only apply what is
+# missing. Foreign keys dropped for the data load wait in deferred_constraint until
+# they are restored, even across failed runs.
+BOOKKEEPING_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version TEXT PRIMARY KEY,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS deferred_constraint (
+    table_name TEXT NOT NULL,
+    constraint_name TEXT NOT NULL,
+    definition TEXT NOT NULL,
+    PRIMARY KEY (table_name, constraint_name)
+);
+"""
+
+# Vocabulary of the synthetic dataset (python setup_db.py --synthetic)
+TITLE_ADJECTIVES = ["Golden", "Silent", "Blue", "Crimson", "Distant", "Quiet", "Burning", "Frozen",
+                    "Hidden", "Ancient", "Bright", "Dark", "Gentle", "Wild", "Lonely", "Sacred",
+                    "Broken", "Sunlit", "Misty", "Scarlet"]
+TITLE_NOUNS = ["Harbor", "Garden", "Portrait", "Landscape", "River", "Cathedral", "Meadow", "Window",
+               "Lady", "Storm", "Village", "Mountain", "Orchard", "Bridge", "Dancer", "Forest",
+               "Sea", "Market", "Madonna", "Still Life"]
+FIRST_NAMES = ["Jan", "Pieter", "Maria", "Giovanni", "Claude", "Anna", "Francisco", "Elisabeth",
+               "Paul", "Frida", "Henri", "Berthe", "Diego", "Sofonisba", "Edvard", "Artemisia"]
+LAST_NAMES = ["Vermeer", "Brueghel", "Rossi", "Bellini", "Moreau", "Novak", "Goya", "Vigée",
+              "Klee", "Kahlo", "Matisse", "Morisot", "Rivera", "Anguissola", "Munch", "Gentileschi"]
+STYLES = ["Renaissance", "Baroque", "Rococo", "Neoclassicism", "Romanticism", "Realism",
+          "Impressionism", "Post-Impressionism", "Expressionism", "Cubism", "Futurism",
+          "Surrealism", "Abstract Expressionism", "Pop Art", "Minimalism", "Contemporary"]
+
+def _sql_array(values):
+    return "ARRAY[" + ", ".join("'" + v.replace("'", "''") + "'" for v in values) + "]"
+
+# Generates the synthetic dataset server-side, one statement per table. Painting counts
+# per artist and per city follow a power law, so a few artists and cities hold most of
+# the paintings. Parameters use pyformat (literal % doubled); every table reseeds the
+# random generator, so the data is identical however the tables are scheduled.
+SYNTHETIC_TABLES = {
+    "country": """
+        INSERT INTO country (iso, country_name)
+        SELECT chr(65 + i / 26) || chr(65 + i %% 26), 'Country ' || i
+        FROM generate_series(0, 99) AS i;
+    """,
+    "city": """
+        INSERT INTO city (country_iso, zipcode, name)
+        SELECT chr(65 + (i %% 100) / 26) || chr(65 + (i %% 100) %% 26), lpad(i::text, 6, '0'), 'City ' || i
+        FROM generate_series(0, %(cities)s - 1) AS i;
+    """,
+    "artist": f"""
+        INSERT INTO artist (first_name, last_name, birth_year, death_year)
+        SELECT ({_sql_array(FIRST_NAMES)})[1 + i %% {len(FIRST_NAMES)}],
+               ({_sql_array(LAST_NAMES)})[1 + (i / {len(FIRST_NAMES)}) %% {len(LAST_NAMES)}] || ' ' || i,
+               1400 + i %% 560, 1440 + i %% 560
+        FROM generate_series(1, %(artists)s) AS i;
+    """,
+    "painting": f"""
+        INSERT INTO painting (title, style_type, year_created)
+        SELECT ({_sql_array(TITLE_ADJECTIVES)})[1 + floor(random() * {len(TITLE_ADJECTIVES)})::int] || ' ' ||
+               ({_sql_array(TITLE_NOUNS)})[1 + floor(random() * {len(TITLE_NOUNS)})::int] || ' No. ' || i,
+               ({_sql_array(STYLES)})[1 + i %% {len(STYLES)}],
+               1401 + i %% 600
+        FROM generate_series(1, %(paintings)s) AS i;
+    """,
+    "painted": """
+        INSERT INTO painted (artist_id, painting_serial_number)
+        SELECT 1 + floor(power(random(), 3) * %(artists)s)::int, serial_number FROM painting ORDER BY serial_number;
+    """,
+    "visitable": """
+        INSERT INTO visitable (city_country_iso, city_zipcode, painting_serial_number)
+        SELECT chr(65 + (k %% 100) / 26) || chr(65 + (k %% 100) %% 26), lpad(k::text, 6, '0'), serial_number
+        FROM (SELECT floor(power(random(), 2) * %(cities)s)::int AS k, serial_number
+              FROM painting ORDER BY serial_number) AS s;
+    """,
+}
+for _table in SYNTHETIC_TABLES:
+    SYNTHETIC_TABLES[_table] = "SELECT setseed(%(seed)s);" + SYNTHETIC_TABLES[_table]
+# The relationship tables are generated from the paintings, so they load in a second stage
+SYNTHETIC_STAGES = [["country", "city", "artist", "painting"], ["painted", "visitable"]]
+# The whole dataset as one script, for loading it in a single session
+SYNTHETIC_DATA_SQL = "".join(SYNTHETIC_TABLES[table] for stage in SYNTHETIC_STAGES for table in stage)
 
 def load_db_config():
     """Reads database credentials from Streamlit secrets."""
@@ -26,53 +132,342 @@ def load_db_config():
         print(f"❌ Error reading secrets file: {e}")
         sys.exit(1)
 
-def execute_sql_file(cursor, filename):
-    """Reads and executes a single SQL file."""
+def connect(config):
+    """Opens a psycopg2 connection using the loaded credentials."""
+    try:
+        return psycopg2.connect(
+            host=config["host"],
+            port=config["port"],
+            database=config["database"],
+            user=config["username"],
+            password=config["password"]
+        )
+    except Exception as e:
+        print(f"❌ Failed to connect to database: {e}")
+        sys.exit(1)
+
+# A dollar quote opener such as $$ or $body$
+DOLLAR_QUOTE = re.compile(r"\$(?:[A-Za-z_][A-Za-z_0-9]*)?\$")
+COPY_FROM_STDIN = re.compile(r"\bCOPY\b.*\bFROM\s+STDIN\b", re.IGNORECASE | re.DOTALL)
+TARGET_TABLE = re.compile(r"^(?:\s*--[^\n]*\n)*\s*(?:INSERT\s+INTO|COPY)\s+([\w.\"]+)", re.IGNORECASE)
+
+class CopyData:
+    """File-like view of the data lines following COPY ... FROM STDIN, up to the \\. line."""
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._buffer = ""
+        self._done = False
+
+    def _next_line(self):
+        if self._done:
+            return None
+        line = next(self._lines, None)
+        if line is None or line.rstrip("\r\n") == "\\.":
+            self._done = True
+            return None
+        return line
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = self._next_line()
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def drain(self):
+        """Skip whatever data was not read."""
+        while self._next_line() is not None:
+            pass
+
+def iter_sql_statements(lines):
+    """Splits a stream of SQL lines into statements without reading it all into memory.
+
+    Semicolons inside quotes, dollar quotes and comments do not end a statement.
+    Yields (statement, copy_data): for COPY ... FROM STDIN, copy_data is a CopyData
+    over the lines that follow, otherwise None.
+    """
+    lines = iter(lines)
+    parts = []
+    has_code = False
+    closing = None  # delimiter closing the open quote or block comment
+    for line in lines:
+        start = i = 0
+        while i < len(line):
+            if closing:
+                end = line.find(closing, i)
+                if end < 0:
+                    i = len(line)
+                    break
+                i = end + len(closing)
+                if closing in ("'", '"') and line.startswith(closing, i):
+                    i += 1  # a doubled quote is an escaped quote
+                    continue
+                closing = None
+            elif line.startswith("--", i):
+                break
+            elif line.startswith("/*", i):
+                closing = "*/"
+                i += 2
+            elif line[i] in ("'", '"'):
+                closing = line[i]
+                has_code = True
+                i += 1
+            elif DOLLAR_QUOTE.match(line, i):
+                closing = DOLLAR_QUOTE.match(line, i).group()
+                has_code = True
+                i += len(closing)
+            elif line[i] == ";":
+                statement = "".join(parts) + line[start:i + 1]
+                parts = []
+                start = i = i + 1
+                if has_code:
+                    has_code = False
+                    if COPY_FROM_STDIN.search(statement):
+                        copy_data = CopyData(lines)
+                        yield statement, copy_data
+                        copy_data.drain()
+                        start = i = len(line)
+                    else:
+                        yield statement, None
+            else:
+                has_code = has_code or not line[i].isspace()
+                i += 1
+        parts.append(line[start:])
+    if has_code:
+        yield "".join(parts), None
+
+def file_checksum(filename):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def execute_sql_file(cursor, filename, table=None):
+    """Streams a SQL file statement by statement, including COPY ... FROM STDIN data.
+
+    With table given, only the statements loading that table are run; such data files
+    may only contain INSERT and COPY statements.
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        for statement, copy_data in iter_sql_statements(f):
+            if table:
+                target = TARGET_TABLE.match(statement)
+                if target is None:
+                    raise ValueError(f"{filename}: data files may only contain INSERT and COPY statements")
+                if target.group(1).split(".")[-1].strip('"').lower() != table:
+                    continue
+            if copy_data:
+                cursor.copy_expert(statement, copy_data)
+            else:
+                cursor.execute(statement)
+
+def applied_versions(conn):
+    """Returns {version: checksum} of everything applied so far."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT version, checksum FROM schema_migrations;")
+        return dict(cur.fetchall())
+
+def record_version(cursor, version, checksum):
+    cursor.execute("INSERT INTO schema_migrations (version, checksum) VALUES (%s, %s);", (version, checksum))
+
+def apply_sql_file(conn, filename, applied):
+    """Runs a schema file in one transaction and records it, unless it was applied before."""
     print(f"📄 Processing {filename}...")
     
     if not os.path.exists(filename):
         print(f"   ❌ File not found: {filename}")
         return False
 
+    checksum = file_checksum(filename)
+    if filename in applied:
+        if applied[filename] != checksum:
+            print(f"   ⚠️ Changed since it was applied, skipping (use --reset to apply everything again).")
+        else:
+            print(f"   ⏭️  Already applied, skipping.")
+        return True
+
     try:
-        with open(filename, "r", encoding="utf-8") as f:
-            sql_content = f.read()
-            cursor.execute(sql_content)
-            print(f"   ✅ Executed successfully.")
-            return True
+        with conn.cursor() as cur:
+            execute_sql_file(cur, filename)
+            record_version(cur, filename, checksum)
+        conn.commit()
+        print(f"   ✅ Executed successfully.")
+        return True
     except Exception as e:
+        conn.rollback()
         print(f"   ❌ Error executing SQL: {e}")
         return False
 
+def defer_foreign_keys(conn):
+    """Drops the foreign keys of the data tables, remembering them in deferred_constraint."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO deferred_constraint (table_name, constraint_name, definition)
+            SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE contype = 'f' AND conrelid = ANY(CAST(%s AS regclass[]))
+            ON CONFLICT DO NOTHING
+            RETURNING table_name, constraint_name;
+        """, (DATA_TABLES,))
+        for table, name in cur.fetchall():
+            cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {};").format(
+                sql.Identifier(table), sql.Identifier(name)))
+    conn.commit()
+
+def restore_foreign_keys(conn):
+    """Adds back the deferred foreign keys; each one validates the loaded rows in bulk."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT table_name, constraint_name, definition FROM deferred_constraint ORDER BY 1, 2;")
+        constraints = cur.fetchall()
+        if not constraints:
+            return True
+        print(f"🔗 Restoring {len(constraints)} foreign keys...")
+        try:
+            for table, name, definition in constraints:
+                cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} ").format(
+                    sql.Identifier(table), sql.Identifier(name)) + sql.SQL(definition) + sql.SQL(";"))
+            cur.execute("DELETE FROM deferred_constraint;")
+            conn.commit()
+            print(f"   ✅ Restored successfully.")
+            return True
+        except Exception as e:
+            conn.rollback()
+            print(f"   ❌ Error restoring foreign keys: {e}")
+            return False
+
+def load_table(config, version, checksum, load):
+    """Loads one table over its own connection and records it, in a single transaction.
+
+    The table is emptied and its serial column restarted first: a failed earlier attempt
+    consumed sequence values, and the other tables refer to the ids of a fresh load.
+    """
+    table = version.split(":")[-1]
+    started = time.perf_counter()
+    conn = connect(config)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("TRUNCATE {} RESTART IDENTITY;").format(sql.Identifier(table)))
+            load(cur)
+            record_version(cur, version, checksum)
+        conn.commit()
+        print(f"   ✅ {table} loaded in {time.perf_counter() - started:.1f}s")
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"   ❌ Error loading {table}: {e}")
+        return False
+    finally:
+        conn.close()
+
+def load_data(conn, config, args, applied):
+    """Loads sample_data.sql or the synthetic dataset, one connection per table.
+
+    Foreign keys are dropped first, so all tables of a stage load concurrently, and
+    restored at the end. Tables loaded by an earlier (failed) run are skipped.
+    """
+    if args.synthetic:
+        source = "synthetic"
+        checksum = hashlib.sha256(f"{args.artists}/{args.cities}/{args.paintings}/{args.seed}".encode()).hexdigest()
+        params = {"artists": args.artists, "cities": args.cities, "paintings": args.paintings, "seed": args.seed}
+        stages = [[(table, lambda cur, table=table: cur.execute(SYNTHETIC_TABLES[table], params))
+                   for table in stage] for stage in SYNTHETIC_STAGES]
+        print(f"🌱 Loading {args.artists} artists, {args.cities} cities and {args.paintings} paintings "
+              f"(seed {args.seed}) with {args.jobs} connections...")
+    else:
+        source = SAMPLE_DATA_FILE
+        checksum = file_checksum(SAMPLE_DATA_FILE)
+        stages = [[(table, lambda cur, table=table: execute_sql_file(cur, SAMPLE_DATA_FILE, table))
+                   for table in DATA_TABLES]]
+        print(f"📄 Loading {SAMPLE_DATA_FILE} with {args.jobs} connections...")
+
+    # Tables are recorded as "<source>:<table>" with the checksum of the whole dataset
+    loaded = {version.split(":")[0]: c for version, c in applied.items() if ":" in version}
+    if any(other != source or c != checksum for other, c in loaded.items()):
+        print("   ❌ The database holds a different dataset. Run again with --reset to replace it.")
+        return False
+
+    pending = [[(table, load) for table, load in stage if f"{source}:{table}" not in applied] for stage in stages]
+    if any(pending):
+        defer_foreign_keys(conn)
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            for stage in pending:
+                results = list(pool.map(lambda task: load_table(config, f"{source}:{task[0]}", checksum, task[1]),
+                                        stage))
+                if not all(results):
+                    print("   ↩️  Run setup_db.py again to retry the failed tables.")
+                    return False
+    else:
+        print(f"   ⏭️  Already loaded, skipping.")
+    return restore_foreign_keys(conn)
+
+def supports_partitioning(conn):
+    """Checks that the server can run the partitioned mode (PostgreSQL 15 or later)."""
+    with conn.cursor() as cur:
+        cur.execute("SHOW server_version_num;")
+        version = int(cur.fetchone()[0])
+    if version < PARTITIONED_MIN_SERVER_VERSION:
+        print(f"❌ --partitioned needs PostgreSQL {PARTITIONED_MIN_SERVER_VERSION // 10000} or later; "
+              f"this server is version {version // 10000}.")
+        return False
+    return True
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create the schema and load sample or synthetic data. "
+                                                 "Reruns apply only what is missing.")
+    parser.add_argument("--reset", action="store_true",
+                        help="drop everything and apply all files again")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help="connections used to load tables concurrently")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="list-partition painting by style_type (also converts an existing database)")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="load a generated dataset instead of sample_data.sql")
+    parser.add_argument("--artists", type=int, default=10000)
+    parser.add_argument("--cities", type=int, default=50000)
+    parser.add_argument("--paintings", type=int, default=1000000)
+    parser.add_argument("--seed", type=float, default=0.42, help="random seed in [-1, 1]")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("🚀 Starting Database Setup...\n")
     
     # 1. Load Config
     config = load_db_config()
     print(f"🔑 Loaded credentials for user '{config['username']}' on '{config['host']}'")
 
-    # 2. Connect to DB
-    try:
-        conn = psycopg2.connect(
-            host=config["host"],
-            port=config["port"],
-            database=config["database"],
-            user=config["username"],
-            password=config["password"]
-        )
-        conn.autocommit = True # Enable autocommit to allow DROP/CREATE operations
-    except Exception as e:
-        print(f"❌ Failed to connect to database: {e}")
+    # 2. Connect to DB and read what was applied before
+    conn = connect(config)
+    with conn.cursor() as cur:
+        cur.execute(BOOKKEEPING_SQL)
+        if args.reset:
+            print("🧹 Reset requested: everything will be applied again.")
+            cur.execute("TRUNCATE schema_migrations, deferred_constraint;")
+    conn.commit()
+    applied = applied_versions(conn)
+
+    # 3. Schema, data (tables loaded concurrently, foreign keys deferred), then migrations
+    success = apply_sql_file(conn, SCHEMA_FILE, applied) and load_data(conn, config, args, applied)
+    for migration in MIGRATIONS:
+        success = success and apply_sql_file(conn, migration, applied)
+    if args.partitioned:
+        success = success and supports_partitioning(conn) and apply_sql_file(conn, PARTITIONED_MIGRATION, applied)
+    if not success:
+        print("\n❌ Aborting setup due to errors. Fix the problem and run setup_db.py again to resume.")
+        conn.close()
         sys.exit(1)
 
-    # 3. Execute Scripts
-    with conn.cursor() as cur:
-        for sql_file in FILES_TO_EXECUTE:
-            success = execute_sql_file(cur, sql_file)
-            if not success:
-                print("\n❌ Aborting setup due to errors.")
-                conn.close()
-                sys.exit(1)
+    # Fresh planner statistics whenever something was loaded
+    if applied_versions(conn) != applied:
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE;")
+        conn.commit()
 
     conn.close()
     print("\n✨ Database setup finished successfully!")
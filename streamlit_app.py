@@ -1,9 +1,160 @@
+import pandas as pd
 import streamlit as st
 from sqlalchemy import text
 
+from bulk_import import DEFAULT_BATCH_SIZE, ENTITY_COLUMNS, import_file
+from db import (LATENCY_BUCKETS_MS, cached_call, current_connection, get_change_listener, get_connection,
+                get_db_metrics, get_query_profiler, get_read_connection, get_replica_router, get_result_cache,
+                get_view_refresher, note_write, pool_settings, pool_status, profiling_settings, routing_settings,
+                run_cached, run_concurrently, run_prepared, run_query)
+from export import EXPORT_FORMATS, export_to_tempfile
+from lookup_cache import LookupCache
+from painting_rows import validate_painting_rows
+import queries
+from search import build_facet_query, build_search_query, build_text_search_query
+
+# Page sizes offered by the paginated "All Paintings" view
+PAGE_SIZE_OPTIONS = [25, 50, 100, 250]
+
+# Results per page of the Advanced Search quick (text) search
+QUICK_SEARCH_PAGE_SIZE = 25
+
+# Rows per page of the Advanced Search filter results (exports always contain all rows)
+SEARCH_RESULTS_PAGE_SIZE = 500
+
+# Painting fields -> array parameters of queries.INSERT_PAINTINGS
+PAINTING_INSERT_PARAMS = {
+    "title": "titles",
+    "style_type": "styles",
+    "year_created": "years",
+    "wikipedia_url": "urls",
+    "artist_id": "artist_ids",
+    "city_country_iso": "city_isos",
+    "city_zipcode": "city_zipcodes",
+}
+
+# Rows in the top artists / cities tables of the Statistics page
+STATISTICS_TOP_N = 10
+
+# Countries and cities charted over time on the Analytics page (the busiest ones)
+ANALYTICS_TOP_N = 10
+
+# Lookup lists (queries.LOOKUP_QUERIES) are cached process-wide with per-entity TTLs (seconds);
+# change notifications drop them as soon as their table changes
+LOOKUP_TTLS = {
+    "countries": 3600,
+    "cities": 3600,
+    "artists": 3600,
+    "styles": 3600,
+}
+
+# Seconds between checks whether another session changed what the current page shows
+LIVE_REFRESH_SECONDS = 5
+
+@st.cache_resource
+def get_lookup_cache():
+    """Single LookupCache instance shared by all sessions of this process"""
+    cache = LookupCache(LOOKUP_TTLS)
+
+    def invalidate(tables):
+        # After a listener reconnect (tables is None) anything may have changed
+        entities = [entity for entity, table in queries.LOOKUP_TABLES.items() if tables is None or table in tables]
+        if entities:
+            cache.invalidate(*entities)
+
+    get_change_listener().subscribe(invalidate)
+    return cache
+
+def lookup_call(conn, entity):
+    """A zero-argument callable returning a lookup list from the shared cache.
+
+    A miss is read from the primary while a replica may still lag behind a change to
+    the list's table, so the cache is not refilled with the old list.
+    """
+    conn = current_connection(conn, (queries.LOOKUP_TABLES[entity],))
+    cache = get_lookup_cache()
+    return lambda: cache.get(entity, lambda: run_prepared(conn, queries.LOOKUP_QUERIES[entity]))
+
+def load_lookup(conn, entity):
+    """Return a lookup list from the shared cache, querying the database on a miss"""
+    return lookup_call(conn, entity)()
+
+def load_lookups(conn, *entities):
+    """Return several lookup lists, querying the missing ones concurrently"""
+    lists = run_concurrently({entity: lookup_call(conn, entity) for entity in entities})
+    return [lists[entity] for entity in entities]
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_refresh(*sqls):
+    """Rerun the page when a change notification arrives for a table its queries read"""
+    tables = sorted({table for sql in sqls for table in queries.QUERY_TABLES[sql]})
+    version = get_change_listener().version(tables)
+    seen_key = "live_refresh_" + "_".join(tables)
+    seen = st.session_state.get(seen_key, version)
+    st.session_state[seen_key] = version
+    if seen != version:
+        st.rerun(scope="app")
+
+def fetch_paintings_page(conn, after_key, page_size):
+    """Fetch one page of paintings with keyset pagination on the view's unique key.
+
+    after_key is the (serial_number, artist_id, city_country_iso, city_zipcode) of the
+    last row before the page. The LIMIT asks for one row more than a page, so at most
+    one page is buffered. Returns the page as a DataFrame and whether a next page exists.
+    """
+    after_serial, after_artist, after_iso, after_zip = after_key
+    rows = run_cached(conn, queries.PAINTINGS_PAGE, {
+        "after_serial": after_serial, "after_artist": after_artist,
+        "after_iso": after_iso, "after_zip": after_zip, "limit": page_size + 1,
+    })
+    return rows.head(page_size), len(rows) > page_size
+
+def page_key(df):
+    """Keyset bookmark of the last row of a paintings page, as plain Python values"""
+    serial_number, artist_id, country_iso, zipcode = df[list(queries.PAINTINGS_PAGE_KEY)].iloc[-1]
+    return int(serial_number), int(artist_id), str(country_iso), str(zipcode)
+
+def insert_paintings(conn, paintings):
+    """Insert paintings and their artist/city links in one statement and one transaction.
+
+    paintings is a list of dicts with the keys of PAINTING_INSERT_PARAMS. Returns the new
+    serial numbers; the reporting view is refreshed in the background afterwards.
+    """
+    params = {param: [painting[key] for painting in paintings] for key, param in PAINTING_INSERT_PARAMS.items()}
+    with conn.session as s:
+        serial_numbers = [row[0] for row in s.execute(text(queries.INSERT_PAINTINGS), params)]
+        s.commit()
+    get_view_refresher().request()
+    note_write()
+    get_lookup_cache().invalidate("styles")
+    return serial_numbers
+
+def show_view_refresh_warning():
+    """Warn when the last background refresh of the reporting view failed"""
+    error = get_view_refresher().status()['last_error']
+    if error:
+        st.warning(f"⚠️ The last refresh of the reporting view failed, so All Paintings and Advanced Search "
+                   f"may not show the newest paintings yet. It is retried with the next added painting. "
+                   f"Error: {error}")
+
+def show_paintings_table(df, link_text="🔗 View"):
+    """Render a paintings result with st.dataframe, the Wikipedia URL as a link column.
+
+    The grid is virtualized (only visible rows are laid out) and values are never
+    interpreted as HTML.
+    """
+    st.dataframe(
+        df,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "wikipedia_url": st.column_config.LinkColumn("wikipedia", display_text=link_text),
+        },
+    )
+
 def show_view_data():
     """Display all data with queries"""
-    conn = st.connection("postgresql", type="sql")
+    conn = get_read_connection()
     st.header('📊 View Database')
     
     # Select view type
@@ -13,77 +164,51 @@ def show_view_data():
     
     if view_type == "All Paintings":
         st.subheader("All Paintings")
-        query = """
-            SELECT 
-                p.serial_number,
-                p.title,
-                p.style_type,
-                p.year_created,
-                a.first_name || ' ' || a.last_name AS artist_name,
-                c.name AS city_name,
-                co.country_name,
-                p.wikipedia_url
-            FROM painting p
-            JOIN painted pt ON p.serial_number = pt.painting_serial_number
-            JOIN artist a ON pt.artist_id = a.id
-            JOIN visitable v ON p.serial_number = v.painting_serial_number
-            JOIN city c ON v.city_country_iso = c.country_iso AND v.city_zipcode = c.zipcode
-            JOIN country co ON c.country_iso = co.iso
-            ORDER BY p.serial_number;
-        """
-        df = conn.query(query, ttl=0)
-        
-        # Create clickable links for Wikipedia
-        if 'wikipedia_url' in df.columns:
-            df['wikipedia'] = df['wikipedia_url'].apply(
-                lambda x: f'<a href="{x}" target="_blank">Wikipedia</a>' if x else ''
-            )
-            df = df.drop('wikipedia_url', axis=1)
-        
-        st.write(df.to_html(escape=False, index=False), unsafe_allow_html=True)
-        st.metric("Total Paintings", len(df))
+        total = run_cached(conn, queries.PAINTINGS_COUNT)['total'].iloc[0]
+
+        page_size = st.selectbox("Paintings per page", PAGE_SIZE_OPTIONS, key="paintings_page_size")
+        # Stack of keyset bookmarks: the key of the last row shown before each visited page
+        if st.session_state.get("paintings_page_size_seen") != page_size:
+            st.session_state.paintings_page_starts = [queries.PAINTINGS_FIRST_KEY]
+            st.session_state.paintings_page_size_seen = page_size
+        page_starts = st.session_state.paintings_page_starts
+
+        df, has_next = fetch_paintings_page(conn, page_starts[-1], page_size)
+
+        show_paintings_table(df.drop(columns=list(queries.PAINTINGS_PAGE_KEY[1:])), "Wikipedia")
+
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ Previous", disabled=len(page_starts) == 1):
+                page_starts.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"Page {len(page_starts)} of {max(1, -(-int(total) // page_size))}")
+        with col3:
+            if st.button("Next ➡️", disabled=not has_next):
+                page_starts.append(page_key(df))
+                st.rerun()
+
+        st.metric("Total Paintings", int(total))
+        live_refresh(queries.PAINTINGS_COUNT, queries.PAINTINGS_PAGE)
     
     elif view_type == "All Artists":
         st.subheader("All Artists")
-        query = """
-            SELECT 
-                a.id,
-                a.first_name,
-                a.last_name,
-                a.birth_year,
-                a.death_year,
-                COUNT(pt.painting_serial_number) AS number_of_paintings
-            FROM artist a
-            LEFT JOIN painted pt ON a.id = pt.artist_id
-            GROUP BY a.id, a.first_name, a.last_name, a.birth_year, a.death_year
-            ORDER BY a.last_name, a.first_name;
-        """
-        df = conn.query(query, ttl=0)
+        df = run_cached(conn, queries.ALL_ARTISTS)
         st.dataframe(df, use_container_width=True)
         st.metric("Total Artists", len(df))
+        live_refresh(queries.ALL_ARTISTS)
     
     elif view_type == "All Cities":
         st.subheader("All Cities")
-        query = """
-            SELECT 
-                c.country_iso,
-                c.zipcode,
-                c.name,
-                co.country_name,
-                COUNT(v.painting_serial_number) AS paintings_count
-            FROM city c
-            JOIN country co ON c.country_iso = co.iso
-            LEFT JOIN visitable v ON c.country_iso = v.city_country_iso AND c.zipcode = v.city_zipcode
-            GROUP BY c.country_iso, c.zipcode, c.name, co.country_name
-            ORDER BY paintings_count DESC, c.name;
-        """
-        df = conn.query(query, ttl=0)
+        df = run_cached(conn, queries.ALL_CITIES)
         st.dataframe(df, use_container_width=True)
         st.metric("Total Cities", len(df))
+        live_refresh(queries.ALL_CITIES)
     
     elif view_type == "Paintings by City":
         st.subheader("Paintings by City")
-        cities_df = conn.query("SELECT country_iso, zipcode, name FROM city ORDER BY name;", ttl=0)
+        cities_df = load_lookup(conn, "cities")
         city_options = {f"{row['name']} ({row['zipcode']})": (row['country_iso'], row['zipcode']) 
                        for _, row in cities_df.iterrows()}
         
@@ -91,28 +216,14 @@ def show_view_data():
         
         if selected_city:
             country_iso, zipcode = city_options[selected_city]
-            query = """
-                SELECT 
-                    p.title,
-                    p.style_type,
-                    p.year_created,
-                    a.first_name || ' ' || a.last_name AS artist_name
-                FROM painting p
-                JOIN visitable v ON p.serial_number = v.painting_serial_number
-                JOIN painted pt ON p.serial_number = pt.painting_serial_number
-                JOIN artist a ON pt.artist_id = a.id
-                WHERE v.city_country_iso = :country_iso AND v.city_zipcode = :zipcode
-                ORDER BY p.year_created;
-            """
-            df = conn.query(query, params={"country_iso": country_iso, "zipcode": zipcode}, ttl=0)
+            df = run_cached(conn, queries.PAINTINGS_BY_CITY, {"country_iso": country_iso, "zipcode": zipcode})
             st.dataframe(df, use_container_width=True)
             st.metric("Paintings in this city", len(df))
+            live_refresh(queries.PAINTINGS_BY_CITY)
     
     elif view_type == "Paintings by Artist":
         st.subheader("Paintings by Artist")
-        artists_df = conn.query(
-            "SELECT id, first_name, last_name FROM artist ORDER BY last_name, first_name;", 
-            ttl=0)
+        artists_df = load_lookup(conn, "artists")
         artist_options = {f"{row['first_name']} {row['last_name']}": row['id'] 
                          for _, row in artists_df.iterrows()}
         
@@ -120,61 +231,213 @@ def show_view_data():
         
         if selected_artist:
             artist_id = artist_options[selected_artist]
-            query = """
-                SELECT 
-                    p.title,
-                    p.style_type,
-                    p.year_created,
-                    c.name AS city_name,
-                    co.country_name
-                FROM painting p
-                JOIN painted pt ON p.serial_number = pt.painting_serial_number
-                JOIN visitable v ON p.serial_number = v.painting_serial_number
-                JOIN city c ON v.city_country_iso = c.country_iso AND v.city_zipcode = c.zipcode
-                JOIN country co ON c.country_iso = co.iso
-                WHERE pt.artist_id = :artist_id
-                ORDER BY p.year_created;
-            """
-            df = conn.query(query, params={"artist_id": artist_id}, ttl=0)
+            df = run_cached(conn, queries.PAINTINGS_BY_ARTIST, {"artist_id": artist_id})
             st.dataframe(df, use_container_width=True)
             st.metric("Paintings by this artist", len(df))
+            live_refresh(queries.PAINTINGS_BY_ARTIST)
     
     elif view_type == "Paintings by Style":
         st.subheader("Paintings by Style")
-        styles_df = conn.query("SELECT DISTINCT style_type FROM painting ORDER BY style_type;", ttl=0)
+        styles_df = load_lookup(conn, "styles")
         
         selected_style = st.selectbox("Select Style", styles_df['style_type'].tolist())
         
         if selected_style:
-            query = """
-                SELECT 
-                    p.title,
-                    p.year_created,
-                    a.first_name || ' ' || a.last_name AS artist_name,
-                    c.name AS city_name
-                FROM painting p
-                JOIN painted pt ON p.serial_number = pt.painting_serial_number
-                JOIN artist a ON pt.artist_id = a.id
-                JOIN visitable v ON p.serial_number = v.painting_serial_number
-                JOIN city c ON v.city_country_iso = c.country_iso AND v.city_zipcode = c.zipcode
-                WHERE p.style_type = :style
-                ORDER BY p.year_created;
-            """
-            df = conn.query(query, params={"style": selected_style}, ttl=0)
+            df = run_cached(conn, queries.PAINTINGS_BY_STYLE, {"style": selected_style})
             st.dataframe(df, use_container_width=True)
             st.metric("Paintings in this style", len(df))
+            live_refresh(queries.PAINTINGS_BY_STYLE)
+
+def show_statistics():
+    """Catalog dashboard read from the trigger-maintained statistics tables"""
+    conn = get_read_connection()
+    st.header('📈 Statistics')
+
+    # All sections are independent, so their queries run concurrently
+    top_n = {"limit": STATISTICS_TOP_N}
+    results = run_concurrently({
+        "totals": cached_call(conn, queries.STATISTICS_TOTALS),
+        "styles": cached_call(conn, queries.PAINTINGS_PER_STYLE),
+        "decades": cached_call(conn, queries.PAINTINGS_PER_DECADE),
+        "countries": cached_call(conn, queries.PAINTINGS_PER_COUNTRY),
+        "artists": cached_call(conn, queries.TOP_ARTISTS, top_n),
+        "cities": cached_call(conn, queries.TOP_CITIES, top_n),
+    })
+
+    totals = results['totals'].iloc[0]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Paintings", int(totals['paintings']))
+    col2.metric("Artists with paintings", int(totals['artists']))
+    col3.metric("Cities with paintings", int(totals['cities']))
+    col4.metric("Countries with paintings", int(totals['countries']))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Paintings per Style")
+        st.bar_chart(results['styles'], x="style_type", y="paintings")
+    with col2:
+        st.subheader("Paintings per Decade")
+        st.bar_chart(results['decades'], x="decade", y="paintings")
+
+    st.subheader("Paintings per Country")
+    st.dataframe(results['countries'], use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader(f"Top {STATISTICS_TOP_N} Artists")
+        st.dataframe(results['artists'], use_container_width=True, hide_index=True)
+    with col2:
+        st.subheader(f"Top {STATISTICS_TOP_N} Cities")
+        st.dataframe(results['cities'], use_container_width=True, hide_index=True)
+
+    live_refresh(queries.STATISTICS_TOTALS, queries.PAINTINGS_PER_STYLE, queries.PAINTINGS_PER_DECADE,
+                 queries.PAINTINGS_PER_COUNTRY, queries.TOP_ARTISTS, queries.TOP_CITIES)
+
+def show_analytics():
+    """Paintings per place and style over time and artist activity, read from the decade rollups"""
+    conn = get_read_connection()
+    st.header('🗺️ Analytics')
+
+    top_n = {"limit": ANALYTICS_TOP_N}
+    results = run_concurrently({
+        "countries": cached_call(conn, queries.COUNTRY_DECADES, top_n),
+        "cities": cached_call(conn, queries.CITY_DECADES, top_n),
+        "styles": cached_call(conn, queries.STYLE_DECADES),
+        "artists": cached_call(conn, queries.ARTIST_DECADES),
+    })
+
+    st.subheader(f"Paintings per Decade in the Top {ANALYTICS_TOP_N} Countries")
+    countries_df = results['countries']
+    if len(countries_df) > 0:
+        st.line_chart(countries_df.pivot(index="decade", columns="country_name", values="paintings").fillna(0))
+    else:
+        st.info("No dated paintings yet.")
+
+    st.subheader(f"Paintings per Decade in the Top {ANALYTICS_TOP_N} Cities")
+    cities_df = results['cities']
+    if len(cities_df) > 0:
+        cities_df = cities_df.assign(city=cities_df['city_name'] + " (" + cities_df['country_iso'] + " "
+                                     + cities_df['zipcode'] + ")")
+        city_options = cities_df.groupby("city")["paintings"].sum().sort_values(ascending=False).index.tolist()
+        chosen = st.multiselect("Cities", city_options, default=city_options[:3], key="analytics_cities")
+        chosen_df = cities_df[cities_df['city'].isin(chosen)]
+        if len(chosen_df) > 0:
+            st.line_chart(chosen_df.pivot(index="decade", columns="city", values="paintings").fillna(0))
+    else:
+        st.info("No dated paintings yet.")
+
+    st.subheader("Styles over Time")
+    styles_df = results['styles']
+    if len(styles_df) > 0:
+        st.area_chart(styles_df.pivot(index="decade", columns="style_type", values="paintings").fillna(0))
+    else:
+        st.info("No dated paintings yet.")
+
+    st.subheader("Artist Activity")
+    st.caption("Artists alive during each decade (from birth and death years), and how many were born and died in it")
+    artists_df = results['artists'].set_index("decade")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.line_chart(artists_df[["active"]])
+    with col2:
+        st.bar_chart(artists_df[["born", "died"]], stack=False)
+
+    live_refresh(queries.COUNTRY_DECADES, queries.CITY_DECADES, queries.STYLE_DECADES, queries.ARTIST_DECADES)
 
 def show_advanced_search():
     """Advanced search with multi-select filters"""
-    conn = st.connection("postgresql", type="sql")
+    conn = get_read_connection()
     st.header('🔍 Advanced Search')
     st.write("Use multiple filters to find specific paintings")
     
-    # Get all filter options
-    countries_df = conn.query("SELECT DISTINCT iso, country_name FROM country ORDER BY country_name;", ttl=0)
-    cities_df = conn.query("SELECT DISTINCT zipcode, name FROM city ORDER BY name;", ttl=0)
-    artists_df = conn.query("SELECT DISTINCT id, first_name, last_name FROM artist ORDER BY last_name, first_name;", ttl=0)
-    styles_df = conn.query("SELECT DISTINCT style_type FROM painting ORDER BY style_type;", ttl=0)
+    # Quick search on titles and artist names (full-text prefix + fuzzy matching)
+    search_term = st.text_input("🔎 Quick search by title or artist", key="quick_search")
+    quick_search = len(search_term.strip()) >= 2
+    
+    # Current selections (from the previous run) decide which options remain
+    selected = {facet: st.session_state.get(f"search_{facet}", [])
+                for facet in ("countries", "cities", "artists", "styles")}
+    
+    # Remaining options of every filter with their painting counts, in one grouped query,
+    # run concurrently with the quick search. The counts are cached per filter set until
+    # the reporting view changes, so typing a quick search does not recount them.
+    facet_query, facet_params = build_facet_query(sorted(selected["countries"]), sorted(selected["cities"]),
+                                                  sorted(selected["artists"]), sorted(selected["styles"]))
+    calls = {"facets": cached_call(conn, facet_query, facet_params,
+                                   tables=("painting_denormalized",), name="search.facets")}
+    if quick_search:
+        if st.session_state.get("quick_search_seen") != search_term:
+            st.session_state.quick_search_page = 0
+            st.session_state.quick_search_seen = search_term
+        page = st.session_state.quick_search_page
+        
+        # Fetch one extra row to find out whether another page follows
+        text_query, text_params = build_text_search_query(
+            search_term, limit=QUICK_SEARCH_PAGE_SIZE + 1, offset=page * QUICK_SEARCH_PAGE_SIZE)
+        calls["quick"] = lambda: run_query(conn, text_query, text_params, name="search.quick")
+    results = run_concurrently(calls)
+    facets_df = results["facets"]
+    
+    if quick_search:
+        matches_df = results["quick"]
+        has_next = len(matches_df) > QUICK_SEARCH_PAGE_SIZE
+        matches_df = matches_df.head(QUICK_SEARCH_PAGE_SIZE).drop(columns='relevance')
+        
+        if len(matches_df) > 0:
+            show_paintings_table(matches_df)
+            
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("⬅️ Previous", key="quick_search_prev", disabled=page == 0):
+                    st.session_state.quick_search_page -= 1
+                    st.rerun()
+            with col2:
+                st.caption(f"Page {page + 1}, most relevant first")
+            with col3:
+                if st.button("Next ➡️", key="quick_search_next", disabled=not has_next):
+                    st.session_state.quick_search_page += 1
+                    st.rerun()
+        else:
+            st.info(f"No paintings or artists match '{search_term}'.")
+        st.divider()
+    
+    total = int(facets_df.loc[facets_df['facet'] == 'total', 'paintings'].iloc[0])
+    
+    def facet_options(facet, key, label, current, lookup=None):
+        """Options for one filter as {key: "label (count)"}, keeping the current selection.
+
+        Selected values without matches are labelled from the lookup list (entity, key, label).
+        """
+        rows = facets_df[facets_df['facet'] == facet]
+        options = {}
+        for _, row in rows.iterrows():
+            options[key(row)] = f"{label(row)} ({row['paintings']})"
+        missing = [value for value in current if value not in options]
+        names = {}
+        if missing and lookup:
+            entity, lookup_key, lookup_label = lookup
+            names = {lookup_key(row): lookup_label(row) for _, row in load_lookup(conn, entity).iterrows()}
+        for value in missing:
+            options[value] = f"{names.get(value, value)} (0)"
+        return options
+    
+    country_labels = facet_options("country", lambda r: r['country_iso'], lambda r: r['country_name'],
+                                    selected["countries"],
+                                    ("countries", lambda r: r['iso'], lambda r: r['country_name']))
+    city_labels = facet_options("city", lambda r: (r['city_country_iso'], r['city_zipcode']),
+                                lambda r: f"{r['city_name']} ({r['city_zipcode']})", selected["cities"],
+                                ("cities", lambda r: (r['country_iso'], r['zipcode']),
+                                 lambda r: f"{r['name']} ({r['zipcode']})"))
+    artist_labels = facet_options("artist", lambda r: int(r['artist_id']), lambda r: r['artist_name'],
+                                   selected["artists"],
+                                   ("artists", lambda r: int(r['id']), lambda r: f"{r['first_name']} {r['last_name']}"))
+    style_labels = facet_options("style", lambda r: r['style_type'], lambda r: r['style_type'],
+                                  selected["styles"])
+    
+    def facet_distinct(facet, key, current):
+        """Distinct values of a facet in the current result, read from the facet counts"""
+        keys = {key(row) for _, row in facets_df[facets_df['facet'] == facet].iterrows()}
+        return len(keys & set(current)) if current else len(keys)
     
     # Create filter options
     col1, col2 = st.columns(2)
@@ -183,106 +446,98 @@ def show_advanced_search():
         st.subheader("Geographic Filters")
         selected_countries = st.multiselect(
             "Select Countries",
-            options=countries_df['country_name'].tolist(),
-            default=None
+            options=list(country_labels.keys()),
+            format_func=country_labels.get,
+            key="search_countries"
         )
         
         selected_cities = st.multiselect(
             "Select Cities",
-            options=cities_df['name'].tolist(),
-            default=None
+            options=list(city_labels.keys()),
+            format_func=city_labels.get,
+            key="search_cities"
         )
     
     with col2:
         st.subheader("Art Filters")
         selected_artists = st.multiselect(
             "Select Artists",
-            options=[f"{row['first_name']} {row['last_name']}" for _, row in artists_df.iterrows()],
-            default=None
+            options=list(artist_labels.keys()),
+            format_func=artist_labels.get,
+            key="search_artists"
         )
         
         selected_styles = st.multiselect(
             "Select Painting Styles",
-            options=styles_df['style_type'].tolist(),
-            default=None
+            options=list(style_labels.keys()),
+            format_func=style_labels.get,
+            key="search_styles"
         )
     
-    # Build dynamic query based on filters
-    query = """
-        SELECT 
-            p.serial_number,
-            p.title,
-            p.style_type,
-            p.year_created,
-            a.first_name || ' ' || a.last_name AS artist_name,
-            c.name AS city_name,
-            co.country_name,
-            p.wikipedia_url
-        FROM painting p
-        JOIN painted pt ON p.serial_number = pt.painting_serial_number
-        JOIN artist a ON pt.artist_id = a.id
-        JOIN visitable v ON p.serial_number = v.painting_serial_number
-        JOIN city c ON v.city_country_iso = c.country_iso AND v.city_zipcode = c.zipcode
-        JOIN country co ON c.country_iso = co.iso
-        WHERE 1=1
-    """
-    
-    params = {}
-    
-    # Add filters dynamically
-    if selected_countries:
-        query += " AND co.country_name = ANY(:countries)"
-        params['countries'] = selected_countries
+    # Build dynamic query based on filters (on key columns); only the current page is fetched
+    filters = (selected_countries, selected_cities, selected_artists, selected_styles)
+    if st.session_state.get("search_results_seen") != filters:
+        st.session_state.search_results_page = 0
+        st.session_state.search_results_seen = filters
+    page = st.session_state.search_results_page
+    pages = max(1, -(-total // SEARCH_RESULTS_PAGE_SIZE))
     
-    if selected_cities:
-        query += " AND c.name = ANY(:cities)"
-        params['cities'] = selected_cities
+    query, params = build_search_query(*filters)
+    page_query, page_params = build_search_query(*filters, limit=SEARCH_RESULTS_PAGE_SIZE,
+                                                 offset=page * SEARCH_RESULTS_PAGE_SIZE)
     
-    if selected_artists:
-        # Convert artist names back to format for comparison
-        query += " AND (a.first_name || ' ' || a.last_name) = ANY(:artists)"
-        params['artists'] = selected_artists
-    
-    if selected_styles:
-        query += " AND p.style_type = ANY(:styles)"
-        params['styles'] = selected_styles
-    
-    query += " ORDER BY p.year_created, p.title;"
-    
-    # Execute query
-    if params:
-        df = conn.query(query, params=params, ttl=0)
+    # Execute query (skipped when the facet counts already show there is nothing to find)
+    if total > 0:
+        df = conn.query(page_query, name="search.results", params=page_params, ttl=0)
     else:
-        df = conn.query(query, ttl=0)
+        df = pd.DataFrame()
     
     # Display results
-    st.subheader(f"Search Results ({len(df)} paintings found)")
+    st.subheader(f"Search Results ({total} paintings found)")
     
     if len(df) > 0:
-        # Create clickable links for Wikipedia
-        if 'wikipedia_url' in df.columns:
-            df['wikipedia'] = df['wikipedia_url'].apply(
-                lambda x: f'<a href="{x}" target="_blank">🔗 View</a>' if x else ''
-            )
-            df = df.drop('wikipedia_url', axis=1)
+        show_paintings_table(df)
         
-        st.write(df.to_html(escape=False, index=False), unsafe_allow_html=True)
+        if pages > 1:
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("⬅️ Previous", key="search_results_prev", disabled=page == 0):
+                    st.session_state.search_results_page -= 1
+                    st.rerun()
+            with col2:
+                st.caption(f"Page {page + 1} of {pages}")
+            with col3:
+                if st.button("Next ➡️", key="search_results_next", disabled=page + 1 >= pages):
+                    st.session_state.search_results_page += 1
+                    st.rerun()
+        
+        # Export the same query straight from the database, generated only on click
+        export_cols = st.columns(len(EXPORT_FORMATS))
+        for export_col, (format_name, (extension, mime)) in zip(export_cols, EXPORT_FORMATS.items()):
+            with export_col:
+                st.download_button(
+                    f"⬇️ {format_name}",
+                    data=lambda extension=extension: export_to_tempfile(conn.engine, query, params, extension),
+                    file_name=f"paintings.{extension}",
+                    mime=mime,
+                    on_click="ignore"
+                )
         
         # Show summary statistics
         st.divider()
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Paintings", len(df))
+            st.metric("Total Paintings", total)
         with col2:
-            st.metric("Different Artists", df['artist_name'].nunique())
+            st.metric("Different Artists", facet_distinct("artist", lambda r: int(r['artist_id']), selected_artists))
         with col3:
-            st.metric("Different Styles", df['style_type'].nunique())
+            st.metric("Different Styles", facet_distinct("style", lambda r: r['style_type'], selected_styles))
     else:
         st.info("No paintings found with the selected filters. Try adjusting your selection.")
 
 def show_add_artist():
     """Form to add a new artist"""
-    conn = st.connection("postgresql", type="sql")
+    conn = get_connection()
     st.header('➕ Add New Artist')
     
     with st.form("add_artist_form"):
@@ -299,23 +554,14 @@ def show_add_artist():
             if first_name and last_name:
                 try:
                     with conn.session as s:
-                        if death_year == 0:
-                            s.execute(
-                                text("""
-                                    INSERT INTO artist (first_name, last_name, birth_year, death_year)
-                                    VALUES (:fn, :ln, :by, NULL)
-                                """),
-                                {"fn": first_name, "ln": last_name, "by": birth_year}
-                            )
-                        else:
-                            s.execute(
-                                text("""
-                                    INSERT INTO artist (first_name, last_name, birth_year, death_year)
-                                    VALUES (:fn, :ln, :by, :dy)
-                                """),
-                                {"fn": first_name, "ln": last_name, "by": birth_year, "dy": death_year}
-                            )
+                        s.execute(
+                            text(queries.INSERT_ARTIST),
+                            {"fn": first_name, "ln": last_name, "by": birth_year,
+                             "dy": death_year if death_year else None}
+                        )
                         s.commit()
+                    note_write()
+                    get_lookup_cache().invalidate("artists")
                     st.success(f"✅ Successfully added artist: {first_name} {last_name}")
                 except Exception as e:
                     st.error(f"❌ Error adding artist: {e}")
@@ -324,11 +570,11 @@ def show_add_artist():
 
 def show_add_city():
     """Form to add a new city"""
-    conn = st.connection("postgresql", type="sql")
+    conn = get_connection()
     st.header('➕ Add New City')
     
     # Get countries for dropdown
-    countries_df = conn.query("SELECT iso, country_name FROM country ORDER BY country_name;", ttl=0)
+    countries_df = load_lookup(conn, "countries")
     country_options = {f"{row['country_name']} ({row['iso']})": row['iso'] 
                       for _, row in countries_df.iterrows()}
     
@@ -345,13 +591,12 @@ def show_add_city():
                     country_iso = country_options[country]
                     with conn.session as s:
                         s.execute(
-                            text("""
-                                INSERT INTO city (country_iso, zipcode, name)
-                                VALUES (:ci, :zc, :n)
-                            """),
+                            text(queries.INSERT_CITY),
                             {"ci": country_iso, "zc": zipcode, "n": name}
                         )
                         s.commit()
+                    note_write()
+                    get_lookup_cache().invalidate("cities")
                     st.success(f"✅ Successfully added city: {name}")
                 except Exception as e:
                     st.error(f"❌ Error adding city: {e}")
@@ -360,7 +605,7 @@ def show_add_city():
 
 def show_add_painting():
     """Form to add a new painting"""
-    conn = st.connection("postgresql", type="sql")
+    conn = get_connection()
     st.header('➕ Add New Painting')
     
     # Predefined list of painting styles
@@ -384,92 +629,256 @@ def show_add_painting():
     ]
     
     # Get artists and cities for dropdowns
-    artists_df = conn.query(
-        "SELECT id, first_name, last_name FROM artist ORDER BY last_name, first_name;", 
-        ttl=0)
+    artists_df, cities_df = load_lookups(conn, "artists", "cities")
     artist_options = {f"{row['first_name']} {row['last_name']}": row['id'] 
                      for _, row in artists_df.iterrows()}
     
-    cities_df = conn.query("SELECT country_iso, zipcode, name FROM city ORDER BY name;", ttl=0)
     city_options = {f"{row['name']} ({row['zipcode']})": (row['country_iso'], row['zipcode']) 
                    for _, row in cities_df.iterrows()}
     
-    with st.form("add_painting_form"):
-        title = st.text_input("Painting Title*")
-        style_type = st.selectbox("Style Type*", painting_styles)
-        year_created = st.number_input("Year Created", min_value=1000, max_value=2024, 
-                                       value=2000, step=1)
-        wikipedia_url = st.text_input("Wikipedia URL (optional)")
-        artist = st.selectbox("Artist*", list(artist_options.keys()))
-        city = st.selectbox("City (where painting is located)*", list(city_options.keys()))
+    show_view_refresh_warning()
+    
+    entry_mode = st.radio("Entry mode", ["Single painting", "Several paintings"], horizontal=True)
+    
+    if entry_mode == "Single painting":
+        with st.form("add_painting_form"):
+            title = st.text_input("Painting Title*")
+            style_type = st.selectbox("Style Type*", painting_styles)
+            year_created = st.number_input("Year Created", min_value=1000, max_value=2024, 
+                                           value=2000, step=1)
+            wikipedia_url = st.text_input("Wikipedia URL (optional)")
+            artist = st.selectbox("Artist*", list(artist_options.keys()))
+            city = st.selectbox("City (where painting is located)*", list(city_options.keys()))
+            
+            submitted = st.form_submit_button("Add Painting")
+            
+            if submitted:
+                if title and style_type and artist and city:
+                    try:
+                        city_country_iso, city_zipcode = city_options[city]
+                        insert_paintings(conn, [{
+                            "title": title, "style_type": style_type, "year_created": year_created,
+                            "wikipedia_url": wikipedia_url or None, "artist_id": artist_options[artist],
+                            "city_country_iso": city_country_iso, "city_zipcode": city_zipcode,
+                        }])
+                        st.success(f"✅ Successfully added painting: {title}")
+                    except Exception as e:
+                        st.error(f"❌ Error adding painting: {e}")
+                else:
+                    st.error("❌ Please fill in all required fields (marked with *)")
+    else:
+        st.write("Enter one painting per row. All rows are saved together, or none if any row is invalid.")
+        empty = pd.DataFrame({
+            "title": pd.Series(dtype="str"),
+            "style_type": pd.Series(dtype="str"),
+            "year_created": pd.Series(dtype="Int64"),
+            "wikipedia_url": pd.Series(dtype="str"),
+            "artist": pd.Series(dtype="str"),
+            "city": pd.Series(dtype="str"),
+        })
+        # Bumped after a successful save to start over with an empty grid
+        editor_version = st.session_state.setdefault("paintings_editor_version", 0)
         
-        submitted = st.form_submit_button("Add Painting")
+        with st.form("add_paintings_form"):
+            edited = st.data_editor(
+                empty,
+                num_rows="dynamic",
+                use_container_width=True,
+                key=f"paintings_editor_{editor_version}",
+                column_config={
+                    "title": st.column_config.TextColumn("Painting Title*", max_chars=200),
+                    "style_type": st.column_config.SelectboxColumn("Style Type*", options=painting_styles),
+                    "year_created": st.column_config.NumberColumn("Year Created", min_value=1000,
+                                                                  max_value=2024, step=1),
+                    "wikipedia_url": st.column_config.TextColumn("Wikipedia URL", max_chars=500),
+                    "artist": st.column_config.SelectboxColumn("Artist*", options=list(artist_options.keys())),
+                    "city": st.column_config.SelectboxColumn("City*", options=list(city_options.keys())),
+                },
+            )
+            submitted = st.form_submit_button("Add Paintings")
         
         if submitted:
-            if title and style_type and artist and city:
+            paintings, errors = validate_painting_rows(edited, artist_options, city_options)
+            if errors:
+                for error in errors:
+                    st.error(f"❌ {error}")
+            elif not paintings:
+                st.error("❌ Please enter at least one painting")
+            else:
                 try:
-                    artist_id = artist_options[artist]
-                    city_country_iso, city_zipcode = city_options[city]
-                    
-                    with conn.session as s:
-                        # Insert painting first
-                        if wikipedia_url:
-                            result = s.execute(
-                                text("""
-                                    INSERT INTO painting (title, style_type, year_created, wikipedia_url)
-                                    VALUES (:t, :st, :yc, :wiki)
-                                    RETURNING serial_number
-                                """),
-                                {"t": title, "st": style_type, "yc": year_created, "wiki": wikipedia_url}
-                            )
-                        else:
-                            result = s.execute(
-                                text("""
-                                    INSERT INTO painting (title, style_type, year_created)
-                                    VALUES (:t, :st, :yc)
-                                    RETURNING serial_number
-                                """),
-                                {"t": title, "st": style_type, "yc": year_created}
-                            )
-                        
-                        painting_id = result.fetchone()[0]
-                        
-                        # Insert into painted relationship
-                        s.execute(
-                            text("""
-                                INSERT INTO painted (artist_id, painting_serial_number)
-                                VALUES (:aid, :psn)
-                            """),
-                            {"aid": artist_id, "psn": painting_id}
-                        )
-                        
-                        # Insert into visitable relationship
-                        s.execute(
-                            text("""
-                                INSERT INTO visitable (city_country_iso, city_zipcode, painting_serial_number)
-                                VALUES (:cciso, :czc, :psn)
-                            """),
-                            {"cciso": city_country_iso, "czc": city_zipcode, "psn": painting_id}
-                        )
-                        
-                        s.commit()
-                    st.success(f"✅ Successfully added painting: {title}")
+                    insert_paintings(conn, paintings)
+                    st.session_state.paintings_editor_version += 1
+                    st.success(f"✅ Successfully added {len(paintings)} paintings")
                 except Exception as e:
-                    st.error(f"❌ Error adding painting: {e}")
+                    st.error(f"❌ Error adding paintings: {e}")
+
+def show_bulk_import():
+    """Upload page for bulk CSV/Parquet imports"""
+    conn = get_connection()
+    st.header('📥 Bulk Import')
+    st.write("Upload a CSV or Parquet file to import many rows at once. "
+             "Rows that fail validation are skipped and listed below.")
+    show_view_refresh_warning()
+    
+    entity = st.selectbox("Import", list(ENTITY_COLUMNS.keys()), format_func=str.capitalize)
+    st.caption("Expected columns: " + ", ".join(ENTITY_COLUMNS[entity]))
+    uploaded = st.file_uploader("File*", type=["csv", "parquet"])
+    batch_size = st.number_input("Batch size", min_value=1000, max_value=500000,
+                                 value=DEFAULT_BATCH_SIZE, step=1000)
+    
+    if st.button("Start Import", disabled=uploaded is None):
+        file_format = "parquet" if uploaded.name.lower().endswith(".parquet") else "csv"
+        progress = st.empty()
+        
+        def report(summary):
+            progress.info(f"{summary['rows']} rows processed, {summary['inserted']} inserted, "
+                          f"{summary['rejected']} rejected ({summary['rows_per_sec']:.0f} rows/sec)")
+        
+        raw_conn = conn.engine.raw_connection()
+        try:
+            summary = import_file(raw_conn.driver_connection, entity, uploaded, file_format,
+                                  batch_size, on_batch=report, refresh_view=get_view_refresher().request)
+        except Exception as e:
+            st.error(f"❌ Error importing {entity}: {e}. Batches reported above as inserted were saved.")
+            return
+        finally:
+            raw_conn.close()
+            # Batches committed before a failure count as writes too
+            note_write()
+            get_lookup_cache().invalidate("artists", "cities", "styles")
+        
+        st.success(f"✅ Imported {summary['inserted']} of {summary['rows']} rows in "
+                   f"{summary['seconds']:.1f}s ({summary['rows_per_sec']:.0f} rows/sec)")
+        if summary['rejected']:
+            st.warning(f"⚠️ {summary['rejected']} rows rejected")
+            st.dataframe(pd.DataFrame(summary['rejects']), use_container_width=True)
+
+def show_database_health():
+    """Connection pool gauges and query latency metrics"""
+    conn = get_connection()
+    st.header('🩺 Database Health')
+
+    st.subheader("Connection Pool")
+    status = pool_status(conn.engine)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Pool size", status['size'])
+    col2.metric("Checked out", status['checked_out'])
+    col3.metric("Idle", status['checked_in'])
+    col4.metric("Overflow", f"{status['overflow']} / {status['max_overflow']}")
+
+    metrics = get_db_metrics().snapshot()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Checkouts", metrics['checkouts'])
+    col2.metric("Avg wait", f"{metrics['checkout_wait_avg_ms']:.1f} ms")
+    col3.metric("Max wait", f"{metrics['checkout_wait_max_ms']:.1f} ms")
+    if metrics['checkout_timeouts']:
+        st.warning(f"⚠️ {metrics['checkout_timeouts']} checkouts timed out waiting for a free connection")
+
+    with st.expander("Pool settings"):
+        st.json(pool_settings())
+
+    replicas = get_replica_router().status()
+    if replicas:
+        st.subheader("Read Replicas")
+        st.dataframe(pd.DataFrame([
+            {"replica": name, "healthy": health['healthy'], "lag_seconds": health['lag_seconds'],
+             "error": health['error']}
+            for name, health in replicas.items()
+        ]), use_container_width=True, hide_index=True)
+        with st.expander("Routing settings"):
+            st.json(routing_settings())
+
+    st.subheader("Reporting View")
+    refresh = get_view_refresher().status()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Refreshes", refresh['refreshes'])
+    col2.metric("Last refresh", f"{refresh['last_seconds']:.1f} s" if refresh['last_seconds'] is not None else "–")
+    col3.metric("Failed refreshes", refresh['errors'])
+    if refresh['running']:
+        st.caption("🔄 Refreshing now" + (", another refresh is queued" if refresh['pending'] else ""))
+    if refresh['last_error']:
+        st.error(f"❌ Last refresh failed: {refresh['last_error']}")
+
+    st.subheader("Query Latency")
+    labels = [f"≤ {bound} ms" for bound in LATENCY_BUCKETS_MS] + [f"> {LATENCY_BUCKETS_MS[-1]} ms"]
+    histogram = pd.DataFrame({"bucket": labels, "queries": metrics['query_histogram']})
+    st.bar_chart(histogram, x="bucket", y="queries", sort=False)
+
+    if metrics['queries']:
+        statements = pd.DataFrame([
+            {"query": key, "count": stats['count'], "avg_ms": stats['total_ms'] / stats['count'],
+             "max_ms": stats['max_ms'], "total_ms": stats['total_ms']}
+            for key, stats in metrics['queries'].items()
+        ]).sort_values("total_ms", ascending=False)
+        st.dataframe(statements, use_container_width=True, hide_index=True)
+    else:
+        st.info("No queries recorded yet")
+
+def show_slow_queries():
+    """Slow-query log: per-query timings and the slowest queries with their sampled plans"""
+    profiler = get_query_profiler()
+    st.header('🐢 Slow Queries')
+
+    settings = profiling_settings()
+    st.caption(f"Log: {settings['log_path']} · plans are sampled for {settings['explain_sample_rate']:.0%} "
+               f"of queries slower than {settings['slow_query_ms']} ms")
+
+    summary = profiler.summary()
+    if not summary:
+        st.info("No queries logged yet")
+        return
+
+    st.subheader("By Query")
+    st.dataframe(pd.DataFrame(summary), use_container_width=True, hide_index=True)
+
+    st.subheader("Slowest Queries")
+    limit = st.selectbox("Show", [10, 20, 50, 100], index=1)
+    for entry in profiler.slowest(limit):
+        with st.expander(f"{entry['elapsed_ms']:.1f} ms · {entry['name']} · {entry['rows']} rows · {entry['logged_at']}"):
+            st.caption(f"Parameters: {entry['params_shape']}")
+            st.code(entry['statement'].strip(), language="sql")
+            if entry['plan']:
+                st.code(entry['plan'], language="text")
             else:
-                st.error("❌ Please fill in all required fields (marked with *)")
+                st.caption("No plan sampled")
+
+    if st.button("Clear log"):
+        profiler.clear()
+        st.rerun()
 
 # Configure pages
 pg = st.navigation([
     st.Page(show_view_data, title="View Data", icon="📊"),
     st.Page(show_advanced_search, title="Advanced Search", icon="🔍"),
+    st.Page(show_statistics, title="Statistics", icon="📈"),
+    st.Page(show_analytics, title="Analytics", icon="🗺️"),
     st.Page(show_add_artist, title="Add Artist", icon="➕"),
     st.Page(show_add_city, title="Add City", icon="🏙️"),
     st.Page(show_add_painting, title="Add Painting", icon="🎨"),
+    st.Page(show_bulk_import, title="Bulk Import", icon="📥"),
+    st.Page(show_database_health, title="Database Health", icon="🩺"),
+    st.Page(show_slow_queries, title="Slow Queries", icon="🐢"),
 ])
 
 st.set_page_config(page_title="Painters & Paintings", page_icon="🎨")
 st.title('🎨 Painters & Paintings Management System')
 
+with st.sidebar.expander("Lookup cache"):
+    cache_stats = get_lookup_cache().stats()
+    st.write(f"Hits: {cache_stats['hits']} · Misses: {cache_stats['misses']} "
+             f"· Hit rate: {cache_stats['hit_rate']:.0%}")
+    st.caption("Cached: " + (", ".join(cache_stats['entities']) or "nothing yet"))
+
+with st.sidebar.expander("Live updates"):
+    listener = get_change_listener()
+    if listener.connected:
+        st.write(f"🟢 Listening · {listener.notifications} changes received")
+    else:
+        st.write("🔴 Not listening, query results are not cached")
+        if listener.last_error:
+            st.caption(listener.last_error)
+    result_cache = get_result_cache()
+    st.caption(f"Cached results: {len(result_cache.keys())} · Evicted: {result_cache.evictions}")
+
 if __name__ == "__main__":
     pg.run()
@@ -0,0 +1,122 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import queries
+from db import ReplicaConnection, ReplicaRouter, current_connection, prepared_form, statement_name
+
+
+def test_prepared_form_numbers_placeholders_in_order_of_first_use():
+    statement, order = prepared_form("""
+        SELECT * FROM painting WHERE year_created BETWEEN :low AND :high OR year_created = :low;
+    """)
+
+    assert statement == "SELECT * FROM painting WHERE year_created BETWEEN $1 AND $2 OR year_created = $1"
+    assert order == ("low", "high")
+
+
+def test_prepared_form_leaves_casts_alone():
+    statement, order = prepared_form("SELECT CAST(:ids AS INTEGER[]), '1'::int, decade::text FROM decade_stat;")
+
+    assert statement == "SELECT CAST($1 AS INTEGER[]), '1'::int, decade::text FROM decade_stat"
+    assert order == ("ids",)
+
+
+def test_prepared_form_of_the_app_queries():
+    assert prepared_form(queries.PAINTINGS_PAGE)[1] == (
+        "after_serial", "after_artist", "after_iso", "after_zip", "limit")
+    assert prepared_form(queries.PAINTINGS_COUNT) == (queries.PAINTINGS_COUNT.rstrip(";"), ())
+
+
+def test_registered_queries_are_prepared_under_their_name():
+    assert statement_name(queries.ALL_ARTISTS) == "all_artists"
+    assert statement_name(queries.LOOKUP_QUERIES["countries"]) == "lookup_countries"
+
+
+def test_unregistered_queries_get_distinct_names_from_their_text():
+    first = statement_name("SELECT title FROM painting WHERE style_type = :style;")
+    second = statement_name("SELECT title FROM painting WHERE year_created = :year;")
+
+    assert first != second
+    assert first == statement_name("SELECT title FROM painting WHERE style_type = :style;")
+    assert first.startswith("q_") and len(first) <= 63
+
+
+def test_router_takes_healthy_replicas_in_turn():
+    router = ReplicaRouter(["r1", "r2", "r3"], max_lag_seconds=10, health_check_seconds=60)
+    lags = {"r1": 0, "r2": 30, "r3": 2}
+
+    assert [router.choose(lags.get) for _ in range(4)] == ["r1", "r3", "r3", "r1"]
+    assert router.status()["r2"]["healthy"] is False
+    assert router.status()["r3"]["lag_seconds"] == 2
+
+
+def test_router_falls_back_when_no_replica_answers():
+    def unreachable(name):
+        raise RuntimeError("WAL receiver is not streaming from the primary")
+
+    router = ReplicaRouter(["r1"], max_lag_seconds=10, health_check_seconds=60)
+
+    assert router.choose(unreachable) is None
+    status = router.status()["r1"]
+    assert status["healthy"] is False and status["lag_seconds"] is None
+    assert status["error"] == "WAL receiver is not streaming from the primary"
+
+
+def test_router_reuses_a_check_for_health_check_seconds(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    probes = []
+    router = ReplicaRouter(["r1"], max_lag_seconds=10, health_check_seconds=15)
+
+    def measure(name):
+        probes.append(name)
+        return 0
+
+    router.choose(measure)
+    clock[0] += 10
+    router.choose(measure)
+    assert probes == ["r1"]
+    clock[0] += 10
+    router.choose(measure)
+    assert probes == ["r1", "r1"]
+
+
+def test_concurrent_sessions_share_one_probe():
+    release = threading.Event()
+    probes = []
+
+    def slow_measure(name):
+        probes.append(name)
+        release.wait()
+        return 1
+
+    router = ReplicaRouter(["r1"], max_lag_seconds=10, health_check_seconds=60)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        chosen = [pool.submit(router.choose, slow_measure) for _ in range(8)]
+        time.sleep(0.1)
+        release.set()
+        assert [future.result() for future in chosen] == ["r1"] * 8
+    assert probes == ["r1"]
+
+
+class FakeListener:
+    connected = True
+
+    def __init__(self, changed_at):
+        self.changed_at = changed_at
+
+    def seconds_since_change(self, tables):
+        return min(time.monotonic() - self.changed_at.get(table, 0.0) for table in tables)
+
+
+def test_replica_reads_go_to_the_primary_right_after_a_change(monkeypatch):
+    monkeypatch.setattr(db, "get_change_listener", lambda: FakeListener({"artist": time.monotonic()}))
+    monkeypatch.setattr(db, "routing_settings", lambda: {"max_lag_seconds": 10})
+    primary = object()
+    replica = ReplicaConnection(object(), None, None, primary)
+
+    assert current_connection(replica, ("artist",)) is primary
+    assert current_connection(replica, ("city",)) is replica
+    assert current_connection(primary, ("artist",)) is primary
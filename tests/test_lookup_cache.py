@@ -0,0 +1,93 @@
+import threading
+
+from lookup_cache import LookupCache
+
+
+def test_get_caches_until_invalidated():
+    cache = LookupCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get("artists", loader) == 1
+    assert cache.get("artists", loader) == 1
+    cache.invalidate("artists")
+    assert cache.get("artists", loader) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("lookup_cache.time.monotonic", lambda: now[0])
+    cache = LookupCache({"countries": 10})
+    assert cache.get("countries", lambda: "old") == "old"
+    now[0] += 11
+    assert cache.get("countries", lambda: "new") == "new"
+
+
+def test_invalidate_without_entities_clears_everything():
+    cache = LookupCache()
+    cache.get("artists", lambda: 1)
+    cache.get("cities", lambda: 2)
+    cache.invalidate()
+    assert cache.keys() == []
+
+
+def test_load_overlapping_invalidate_is_not_stored():
+    cache = LookupCache()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait()
+        return "stale"
+
+    thread = threading.Thread(target=cache.get, args=("artists", slow_loader))
+    thread.start()
+    started.wait()
+    cache.invalidate("artists")
+    release.set()
+    thread.join()
+
+    assert cache.keys() == []
+    assert cache.get("artists", lambda: "fresh") == "fresh"
+    assert cache.get("artists", lambda: "unused") == "fresh"
+
+
+def test_load_overlapping_clear_is_not_stored():
+    cache = LookupCache()
+
+    def loader():
+        cache.invalidate()
+        return "stale"
+
+    assert cache.get("styles", loader) == "stale"
+    assert cache.keys() == []
+
+
+def test_failed_load_is_not_cached():
+    cache = LookupCache()
+
+    def failing():
+        raise RuntimeError("boom")
+
+    try:
+        cache.get("cities", failing)
+    except RuntimeError:
+        pass
+    assert cache.get("cities", lambda: "ok") == "ok"
+
+
+def test_least_recently_used_entries_are_evicted_beyond_max_entries():
+    cache = LookupCache(max_entries=2)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    cache.get("a", lambda: 1)  # a is now more recently used than b
+    cache.get("c", lambda: 3)
+
+    assert sorted(cache.keys()) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("b", lambda: "reloaded") == "reloaded"
+    assert sorted(cache.keys()) == ["b", "c"]
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from painting_rows import validate_painting_rows
+
+ARTISTS = {"Claude Monet": 3, "Frida Kahlo": 9}
+CITIES = {"Paris (75001)": ("FR", "75001"), "Mexico City (06000)": ("MX", "06000")}
+
+
+def grid(*rows):
+    columns = ["title", "style_type", "year_created", "wikipedia_url", "artist", "city"]
+    df = pd.DataFrame(rows, columns=columns)
+    df["year_created"] = df["year_created"].astype("Int64")
+    return df
+
+
+def test_valid_rows_are_resolved_to_keys():
+    paintings, errors = validate_painting_rows(grid(
+        ("Water Lilies", "Impressionism", 1906, "https://en.wikipedia.org/wiki/Water_Lilies",
+         "Claude Monet", "Paris (75001)"),
+        ("The Two Fridas", "Surrealism", None, None, "Frida Kahlo", "Mexico City (06000)"),
+    ), ARTISTS, CITIES)
+
+    assert errors == []
+    assert paintings == [
+        {"title": "Water Lilies", "style_type": "Impressionism", "year_created": 1906,
+         "wikipedia_url": "https://en.wikipedia.org/wiki/Water_Lilies", "artist_id": 3,
+         "city_country_iso": "FR", "city_zipcode": "75001"},
+        {"title": "The Two Fridas", "style_type": "Surrealism", "year_created": None,
+         "wikipedia_url": None, "artist_id": 9, "city_country_iso": "MX", "city_zipcode": "06000"},
+    ]
+    assert type(paintings[0]["year_created"]) is int
+
+
+def test_empty_rows_are_ignored():
+    paintings, errors = validate_painting_rows(grid(
+        (None, None, None, None, None, None),
+        ("", "", None, "", "", ""),
+    ), ARTISTS, CITIES)
+
+    assert paintings == [] and errors == []
+
+
+def test_problems_are_reported_by_row_number():
+    paintings, errors = validate_painting_rows(grid(
+        ("Impression, Sunrise", "Impressionism", 1872, None, "Claude Monet", "Paris (75001)"),
+        ("", "Cubism", None, None, None, "Paris (75001)"),
+        ("Guernica", "Cubism", 1937, None, "Pablo Picasso", "Paris (75001)"),
+        ("The Frame", "Surrealism", 1938, None, "Frida Kahlo", "Coyoacán (04000)"),
+    ), ARTISTS, CITIES)
+
+    assert [painting["title"] for painting in paintings] == ["Impression, Sunrise"]
+    assert errors == [
+        "Row 2: missing title, artist",
+        "Row 3: unknown artist 'Pablo Picasso'",
+        "Row 4: unknown city 'Coyoacán (04000)'",
+    ]
@@ -0,0 +1,31 @@
+import sqlite3
+
+from profiling import QueryProfiler, params_shape
+
+
+def test_params_shape_hides_values():
+    assert params_shape({"ids": [1, 2, 3], "name": "Monet", "year": 1872}) == \
+        '{"ids": "list[3]", "name": "str", "year": "int"}'
+    assert params_shape(None) == "{}"
+
+
+def test_recorded_queries_are_written_in_the_background(tmp_path):
+    profiler = QueryProfiler(str(tmp_path / "log.sqlite"), slow_ms=100, explain_rate=0)
+    for elapsed_ms in (5, 250, 40):
+        profiler.record("all_artists", "SELECT 1", None, 3, elapsed_ms)
+    profiler.record("top_artists", "SELECT 2", {"limit": 10}, 10, 120)
+    profiler.flush()
+
+    summary = {row["name"]: row for row in profiler.summary()}
+    assert summary["all_artists"]["calls"] == 3 and summary["all_artists"]["slow_calls"] == 1
+    assert summary["top_artists"]["max_ms"] == 120
+    assert [row["elapsed_ms"] for row in profiler.slowest(2)] == [250, 120]
+
+    profiler.clear()
+    assert profiler.summary() == []
+
+
+def test_log_file_is_in_wal_mode(tmp_path):
+    path = tmp_path / "log.sqlite"
+    QueryProfiler(str(path))
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
@@ -0,0 +1,69 @@
+import pytest
+
+from search import _filter_predicates, build_facet_query, build_search_query, build_text_search_query
+
+
+def test_no_filters_gives_no_predicates():
+    assert _filter_predicates() == ({}, {})
+    assert _filter_predicates([], [], [], []) == ({}, {})
+
+
+def test_each_facet_filters_its_key_column():
+    predicates, params = _filter_predicates(
+        country_isos=("FR", "NL"),
+        city_keys=[("FR", "75001"), ("NL", "1012")],
+        artist_ids=["7", 12],
+        styles={"Baroque"},
+    )
+
+    assert set(predicates) == {"country", "city", "artist", "style"}
+    assert "country_iso = ANY" in predicates["country"]
+    assert "(city_country_iso, city_zipcode) IN" in predicates["city"]
+    assert "artist_id = ANY" in predicates["artist"]
+    assert "style_type = ANY" in predicates["style"]
+    assert params == {
+        "country_isos": ["FR", "NL"],
+        "city_isos": ["FR", "NL"],
+        "city_zipcodes": ["75001", "1012"],
+        "artist_ids": [7, 12],
+        "styles": ["Baroque"],
+    }
+
+
+def test_search_query_applies_only_selected_filters():
+    query, params = build_search_query(artist_ids=[3])
+
+    assert "artist_id = ANY(CAST(:artist_ids AS INTEGER[]))" in query
+    assert "country_iso = ANY" not in query
+    assert "LIMIT" not in query
+    assert params == {"artist_ids": [3]}
+
+
+@pytest.mark.parametrize("limit, offset", [(50, 0), (50, 100)])
+def test_search_query_pages_a_total_order(limit, offset):
+    query, params = build_search_query(styles=["Cubism"], limit=limit, offset=offset)
+
+    order_by = query.split("ORDER BY", 1)[1]
+    assert "serial_number" in order_by and order_by.index("serial_number") < order_by.index("LIMIT")
+    assert query.rstrip().endswith("LIMIT :limit OFFSET :offset;")
+    assert params["limit"] == limit and params["offset"] == offset
+
+
+def test_facet_query_counts_each_facet_against_the_other_filters():
+    query, params = build_facet_query(country_isos=["FR"], styles=["Baroque"])
+
+    assert "(country_iso = ANY(CAST(:country_isos AS CHAR(2)[]))) AS in_country" in query
+    assert "(style_type = ANY(:styles)) AS in_style" in query
+    assert "(TRUE) AS in_city" in query and "(TRUE) AS in_artist" in query
+    assert "COUNT(*) FILTER (WHERE in_city AND in_artist AND in_style) AS country_count" in query
+    assert params == {"country_isos": ["FR"], "styles": ["Baroque"]}
+
+
+@pytest.mark.parametrize("cte", ["title_matches", "artist_paintings"])
+def test_text_search_keeps_the_best_ranked_candidates(cte):
+    query, params = build_text_search_query("monet water lilies")
+
+    body = query.split(f"{cte} AS (", 1)[1].split("), ", 1)[0]
+    order_by = body.split("ORDER BY", 1)[1]
+    assert "LIMIT :candidates" in order_by
+    assert order_by.split(",", 1)[0].strip() in ("rank DESC", "am.score DESC")
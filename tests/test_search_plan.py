@@ -0,0 +1,94 @@
+"""Regression check: an artist-filtered Advanced Search must use the artist index.
+
+Seeds a large synthetic catalog into a scratch schema, builds the exact query the
+Advanced Search page issues for an artist filter and inspects its EXPLAIN plan.
+The query reads only the reporting view, which it must reach through
+idx_painting_denormalized_artist_id: a sequential scan, or an index scan over the
+whole view in year/title order that filters the artist afterwards, fails the test.
+Skipped when no database is configured or reachable.
+"""
+import json
+import os
+import sys
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from search import build_search_query
+from setup_db import SECRETS_FILE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA = "plan_check"
+MIGRATIONS = ["migrations/001_indexes_and_reporting_view.sql"]
+SEARCHED_RELATION = "painting_denormalized"
+ARTIST_INDEX = "idx_painting_denormalized_artist_id"
+YEAR_TITLE_INDEX = "idx_painting_denormalized_year_title"
+ARTISTS, CITIES, PAINTINGS = 20000, 5000, 200000
+
+
+def index_names(plan):
+    """Names of all indexes read by an EXPLAIN (FORMAT JSON) plan."""
+    if "Index Name" in plan:
+        yield plan["Index Name"]
+    for child in plan.get("Plans", []):
+        yield from index_names(child)
+
+
+def scans(plan):
+    """Yield (node type, relation name) for all scan nodes in an EXPLAIN (FORMAT JSON) plan."""
+    if "Relation Name" in plan:
+        yield plan["Node Type"], plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from scans(child)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    if not os.path.exists(os.path.join(ROOT, SECRETS_FILE)):
+        pytest.skip(f"no database configured in {SECRETS_FILE}")
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    from common import drop_scratch_schema, scratch_engine, seed_scratch_schema
+
+    cwd = os.getcwd()
+    engine = scratch_engine(SCHEMA)
+    try:
+        try:
+            seed_scratch_schema(engine, SCHEMA, MIGRATIONS, ARTISTS, CITIES, PAINTINGS)
+        except OperationalError as e:
+            pytest.skip(f"database not reachable: {e.orig}")
+        yield engine
+        drop_scratch_schema(engine, SCHEMA)
+    finally:
+        engine.dispose()
+        os.chdir(cwd)
+
+
+def artist_plan(engine, artist_id):
+    query, params = build_search_query(artist_ids=[artist_id])
+    with engine.connect() as conn:
+        plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + query), params).scalar()
+    return (plan if isinstance(plan, list) else json.loads(plan))[0]["Plan"]
+
+
+def median_artist(engine):
+    """An artist with the median painting count."""
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT artist_id FROM painted GROUP BY artist_id
+            ORDER BY COUNT(*) DESC
+            OFFSET (SELECT COUNT(DISTINCT artist_id) / 2 FROM painted) LIMIT 1
+        """)).scalar()
+
+
+@pytest.mark.parametrize("artist", ["median", "rare"])
+def test_artist_search_reads_the_view_through_the_artist_index(engine, artist):
+    artist_id = median_artist(engine) if artist == "median" else ARTISTS
+    plan = artist_plan(engine, artist_id)
+
+    nodes = {node for node, relation in scans(plan) if relation == SEARCHED_RELATION}
+    assert nodes and "Seq Scan" not in nodes
+    indexes = set(index_names(plan))
+    assert ARTIST_INDEX in indexes
+    assert YEAR_TITLE_INDEX not in indexes
@@ -0,0 +1,59 @@
+import io
+
+from setup_db import iter_sql_statements
+
+
+def statements(sql):
+    return [(statement.strip(), copy_data) for statement, copy_data in iter_sql_statements(io.StringIO(sql))]
+
+
+def test_splits_on_semicolons_across_lines():
+    assert statements("CREATE TABLE a (id INT);\nINSERT INTO a\nVALUES (1); SELECT 1;\n") == [
+        ("CREATE TABLE a (id INT);", None),
+        ("INSERT INTO a\nVALUES (1);", None),
+        ("SELECT 1;", None),
+    ]
+
+
+def test_semicolons_in_quotes_and_comments_do_not_end_a_statement():
+    sql = (
+        "INSERT INTO t VALUES ('a;b', 'it''s;', \"odd;name\");\n"
+        "-- a comment; with a semicolon\n"
+        "/* block; comment\n spanning; lines */ SELECT 2;\n"
+    )
+    assert [statement for statement, _ in statements(sql)] == [
+        "INSERT INTO t VALUES ('a;b', 'it''s;', \"odd;name\");",
+        "-- a comment; with a semicolon\n/* block; comment\n spanning; lines */ SELECT 2;",
+    ]
+
+
+def test_dollar_quoted_bodies_stay_in_one_statement():
+    sql = (
+        "CREATE FUNCTION f() RETURNS void AS $body$\n"
+        "BEGIN\n  PERFORM 1; PERFORM $$;$$;\nEND;\n"
+        "$body$ LANGUAGE plpgsql;\n"
+        "SELECT f();\n"
+    )
+    result = statements(sql)
+    assert len(result) == 2
+    assert result[0][0].endswith("$body$ LANGUAGE plpgsql;")
+    assert result[1] == ("SELECT f();", None)
+
+
+def test_comment_only_input_yields_nothing_and_trailing_statement_is_kept():
+    assert statements("-- nothing here;\n/* ; */\n") == []
+    assert statements("SELECT 1;\nSELECT 2") == [("SELECT 1;", None), ("SELECT 2", None)]
+
+
+def test_copy_from_stdin_data_is_streamed_up_to_the_terminator():
+    sql = "COPY t (a, b) FROM STDIN;\n1\tx;y\n2\tz\n\\.\nSELECT 3;\n"
+    result = []
+    for statement, copy_data in iter_sql_statements(io.StringIO(sql)):
+        result.append((statement.strip(), copy_data.read() if copy_data else None))
+    assert result == [("COPY t (a, b) FROM STDIN;", "1\tx;y\n2\tz\n"), ("SELECT 3;", None)]
+
+
+def test_unread_copy_data_is_skipped():
+    sql = "COPY t FROM STDIN;\n1\n2\n\\.\nSELECT 4;\n"
+    assert [statement.strip() for statement, _ in iter_sql_statements(io.StringIO(sql))] == [
+        "COPY t FROM STDIN;", "SELECT 4;"]
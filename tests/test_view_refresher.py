@@ -0,0 +1,54 @@
+import threading
+import time
+
+from db import ViewRefresher
+
+
+def wait_idle(refresher):
+    for _ in range(200):
+        if not refresher.status()["running"]:
+            return
+        time.sleep(0.01)
+    raise AssertionError("refresher still running")
+
+
+def test_requests_during_a_refresh_fold_into_one_more():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        started.set()
+        release.wait()
+
+    refresher = ViewRefresher(refresh)
+    refresher.request()
+    started.wait()
+    for _ in range(5):
+        refresher.request()
+    assert refresher.status()["pending"]
+    release.set()
+    wait_idle(refresher)
+
+    assert len(calls) == 2
+    assert refresher.status()["refreshes"] == 2
+
+
+def test_failed_refresh_is_reported_and_cleared_by_the_next_success():
+    outcomes = [RuntimeError("canceling statement due to statement timeout"), None]
+
+    def refresh():
+        outcome = outcomes.pop(0)
+        if outcome:
+            raise outcome
+
+    refresher = ViewRefresher(refresh)
+    refresher.request()
+    wait_idle(refresher)
+    status = refresher.status()
+    assert status["errors"] == 1 and "statement timeout" in status["last_error"]
+
+    refresher.request()
+    wait_idle(refresher)
+    status = refresher.status()
+    assert status["last_error"] is None and status["refreshes"] == 1